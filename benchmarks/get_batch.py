@@ -0,0 +1,86 @@
+"""
+Microbenchmark `cs336_basics.data.get_batch` against the per-row implementation it replaced.
+
+Both gather from the same uint16 memmap with the same torch RNG state, so
+their batches are also checked to be identical:
+
+    python benchmarks/get_batch.py --num-tokens 100000000 --batch-size 128 --context-length 512
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+import torch
+
+from cs336_basics.data import get_batch
+
+
+def get_batch_per_row(
+    dataset: npt.NDArray, batch_size: int, context_length: int, device: str
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """The previous `get_batch`: two slices, casts and tensors per row, stacked twice."""
+    starting_idxs = torch.randint(len(dataset) - context_length, (batch_size,))
+    x = torch.stack([torch.from_numpy((dataset[i : i + context_length]).astype(np.int64)) for i in starting_idxs])
+    y = torch.stack(
+        [torch.from_numpy((dataset[i + 1 : i + 1 + context_length]).astype(np.int64)) for i in starting_idxs]
+    )
+    if "cuda" in device:
+        x = x.pin_memory().to(device, non_blocking=True)
+        y = y.pin_memory().to(device, non_blocking=True)
+    else:
+        x = x.to(device)
+        y = y.to(device)
+    return x, y
+
+
+def time_per_batch(fn, dataset: npt.NDArray, args: argparse.Namespace) -> float:
+    torch.manual_seed(args.seed)
+    fn(dataset, args.batch_size, args.context_length, args.device)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        x, y = fn(dataset, args.batch_size, args.context_length, args.device)
+    if "cuda" in args.device:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args.steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-tokens", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--context-length", type=int, default=512)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "tokens.bin"
+        tokens = np.memmap(path, dtype=np.uint16, mode="w+", shape=(args.num_tokens,))
+        tokens[:] = np.random.default_rng(args.seed).integers(0, 50257, args.num_tokens, dtype=np.uint16)
+        tokens.flush()
+        dataset = np.memmap(path, dtype=np.uint16, mode="r")
+
+        batches = {}
+        for fn in (get_batch_per_row, get_batch):
+            torch.manual_seed(args.seed)
+            batches[fn] = [fn(dataset, args.batch_size, args.context_length, args.device) for _ in range(3)]
+        for (x, y), (x_ref, y_ref) in zip(batches[get_batch], batches[get_batch_per_row]):
+            assert torch.equal(x, x_ref) and torch.equal(y, y_ref), "get_batch and the per-row reference disagree"
+
+        print(f"batch_size={args.batch_size} context_length={args.context_length} device={args.device}")
+        baseline = None
+        for name, fn in (("per-row", get_batch_per_row), ("vectorized", get_batch)):
+            seconds = time_per_batch(fn, dataset, args)
+            baseline = baseline or seconds
+            print(f"{name:>12} {seconds * 1e3:>8.3f} ms/batch {baseline / seconds:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
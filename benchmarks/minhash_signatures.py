@@ -0,0 +1,62 @@
+"""
+Benchmark multi-process MinHash signature generation.
+
+Writes a synthetic corpus to a temporary directory and times
+`compute_signatures` with an increasing number of worker processes, reporting
+documents per second and the speedup over a single process:
+
+    python benchmarks/minhash_signatures.py --num-docs 200000 --max-workers 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from cs336_data.minhash import MinHasher, compute_signatures
+
+
+def write_corpus(directory: Path, num_docs: int, words_per_doc: int, seed: int = 0) -> list[Path]:
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"word{i}" for i in range(50_000)])
+    paths = []
+    for i in range(num_docs):
+        path = directory / f"doc{i:07d}.txt"
+        path.write_text(" ".join(vocabulary[rng.integers(0, len(vocabulary), words_per_doc)]))
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-docs", type=int, default=20_000)
+    parser.add_argument("--words-per-doc", type=int, default=500)
+    parser.add_argument("--num-hashes", type=int, default=128)
+    parser.add_argument("--ngrams", type=int, default=5)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-docs", type=int, default=1024)
+    args = parser.parse_args()
+
+    # Powers of two up to and including max_workers.
+    worker_counts = sorted({args.max_workers} | {2**i for i in range(args.max_workers.bit_length())})
+    minhasher = MinHasher(args.num_hashes, args.ngrams)
+    with tempfile.TemporaryDirectory(prefix="minhash_bench_") as tmp:
+        tmp = Path(tmp)
+        input_files = write_corpus(tmp, args.num_docs, args.words_per_doc)
+        baseline = None
+        print(f"{'workers':>8} {'seconds':>9} {'docs/s':>10} {'speedup':>8}")
+        for num_workers in worker_counts:
+            start = time.perf_counter()
+            compute_signatures(input_files, minhasher, tmp / "signatures.npy", num_workers, args.batch_docs)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(f"{num_workers:>8} {seconds:>9.2f} {args.num_docs / seconds:>10.0f} {baseline / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
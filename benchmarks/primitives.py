@@ -0,0 +1,182 @@
+"""
+Benchmark the data-filtering primitives on the test fixtures and synthetic scale-ups.
+
+Every primitive runs in a fresh process, so its peak RSS is not inflated by
+the primitives before it. Results are written as JSON and can be compared
+against the results of an earlier commit:
+
+    python benchmarks/primitives.py --output benchmarks/results/new.json --baseline benchmarks/results/old.json
+
+Inputs are the fixture documents (moby.html, low_quality_cc.txt,
+high_quality_wiki_reference.txt, moby_extracted.txt) repeated `--scale`
+times, plus one document made of `--scale` concatenated copies of all of
+them. Primitives whose models or data are not available are reported as
+skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+FIXTURES_PATH = Path(__file__).resolve().parent.parent / "tests" / "fixtures"
+TEXT_FIXTURES = ("low_quality_cc.txt", "high_quality_wiki_reference.txt", "moby_extracted.txt")
+
+
+def text_inputs(scale: int) -> list[str]:
+    texts = [(FIXTURES_PATH / name).read_text() for name in TEXT_FIXTURES]
+    return texts * scale + ["\n".join(texts) * scale]
+
+
+def html_inputs(scale: int) -> list[bytes]:
+    pages = [(FIXTURES_PATH / "moby.html").read_bytes()]
+    for text in text_inputs(1)[:-1]:
+        paragraphs = "".join(f"<p>{html.escape(line)}</p>\n" for line in text.splitlines())
+        pages.append(f"<html><head><title>t</title></head><body>{paragraphs}</body></html>".encode())
+    return pages * scale + [b"".join(pages) * scale]
+
+
+@dataclass
+class Primitive:
+    make_inputs: Callable[[int], list]
+    # Processes a whole list of inputs; single-document primitives are mapped over it.
+    run: Callable[[list], Any]
+
+
+def _each(fn: Callable[[Any], Any]) -> Callable[[list], Any]:
+    return lambda documents: [fn(document) for document in documents]
+
+
+def primitives() -> dict[str, Primitive]:
+    from cs336_data.extract_text import extract_text
+    from cs336_data.gopher_filters import gopher_quality_filter
+    from cs336_data.harmful_content import classify_harmful_batch, identify_hatespeech, identify_nsfw
+    from cs336_data.language_identification import identify_language, identify_language_batch
+    from cs336_data.mask_emails import mask_phone_numbers, mask_pii
+    from cs336_data.quality_classifier import classify_quality_batch
+
+    return {
+        "extract_text": Primitive(html_inputs, _each(extract_text)),
+        "identify_language": Primitive(text_inputs, _each(identify_language)),
+        "identify_language_batch": Primitive(text_inputs, identify_language_batch),
+        "mask_phone_numbers": Primitive(text_inputs, _each(mask_phone_numbers)),
+        "mask_pii": Primitive(text_inputs, _each(mask_pii)),
+        "gopher_quality_filter_nltk": Primitive(text_inputs, _each(lambda text: gopher_quality_filter(text, "nltk"))),
+        "gopher_quality_filter_regex": Primitive(text_inputs, _each(lambda text: gopher_quality_filter(text, "regex"))),
+        "identify_hatespeech": Primitive(text_inputs, _each(identify_hatespeech)),
+        "identify_nsfw": Primitive(text_inputs, _each(identify_nsfw)),
+        "classify_harmful_batch": Primitive(text_inputs, classify_harmful_batch),
+        "classify_quality_batch": Primitive(text_inputs, classify_quality_batch),
+    }
+
+
+def measure(name: str, scale: int, repeat: int) -> dict[str, Any]:
+    """Run one primitive in this process and report its throughput and peak RSS."""
+    from cs336_data.deduplication import peak_rss_bytes
+
+    primitive = primitives()[name]
+    documents = primitive.make_inputs(scale)
+    num_bytes = sum(len(document if isinstance(document, bytes) else document.encode()) for document in documents)
+    try:
+        # Warm up once, which also loads models, so that only steady-state work is timed.
+        primitive.run(documents[:1])
+    except (FileNotFoundError, LookupError) as e:
+        # NLTK frames its LookupError message in lines of asterisks.
+        message = [line.strip() for line in str(e).splitlines() if line.strip(" *")]
+        return {"skipped": f"{type(e).__name__}: {message[0] if message else ''}"}
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        primitive.run(documents)
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    return {
+        "num_documents": len(documents),
+        "num_bytes": num_bytes,
+        "seconds": best,
+        "documents_per_second": len(documents) / best,
+        "mb_per_second": num_bytes / 1e6 / best,
+        "peak_rss_mb": peak_rss_bytes() / 1e6,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Names of primitives whose throughput dropped by more than `tolerance` relative to `baseline`."""
+    regressions = []
+    for name, result in results["primitives"].items():
+        previous = baseline.get("primitives", {}).get(name, {})
+        if "documents_per_second" not in result or "documents_per_second" not in previous:
+            continue
+        ratio = result["documents_per_second"] / previous["documents_per_second"]
+        print(f"{name:>30} {ratio:>7.2f}x of baseline")
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=20, help="Copies of every fixture document")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per primitive; the fastest is reported")
+    parser.add_argument("--only", nargs="+", default=None, help="Primitives to run (defaults to all)")
+    parser.add_argument("--output", type=Path, default=None, help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop")
+    args = parser.parse_args()
+
+    names = args.only or list(primitives())
+    results = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "primitives": {},
+    }
+    print(f"{'primitive':>30} {'docs/s':>10} {'MB/s':>8} {'peak RSS MB':>12}")
+    for name in names:
+        # A fresh interpreter per primitive keeps peak RSS and loaded models separate.
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(measure, name, args.scale, args.repeat).result()
+        results["primitives"][name] = result
+        if "skipped" in result:
+            print(f"{name:>30} skipped ({result['skipped']})")
+        else:
+            print(
+                f"{name:>30} {result['documents_per_second']:>10.1f} {result['mb_per_second']:>8.2f} "
+                f"{result['peak_rss_mb']:>12.1f}"
+            )
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"Throughput regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
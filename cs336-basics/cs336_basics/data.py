@@ -1,5 +1,13 @@
 from __future__ import annotations
 
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
 import numpy as np
 import numpy.typing as npt
 import torch
@@ -9,20 +17,261 @@ def get_batch(
     dataset: npt.NDArray, batch_size: int, context_length: int, device: str
 ) -> tuple[torch.Tensor, torch.Tensor]:
     starting_idxs = torch.randint(len(dataset) - context_length, (batch_size,))
-    x = torch.stack([
-            torch.from_numpy((dataset[i : i + context_length]).astype(np.int64))
-            for i in starting_idxs
-    ])  # fmt: skip
-    y = torch.stack(
-        [
-            torch.from_numpy((dataset[i + 1 : i + 1 + context_length]).astype(np.int64))
-            for i in starting_idxs
-        ]
-    )  # fmt: skip
+    return batch_from_starts(dataset, starting_idxs, context_length, device)
+
+
+def batch_from_starts(
+    dataset: npt.NDArray,
+    starting_idxs: torch.Tensor,
+    context_length: int,
+    device: str,
+    buffer: torch.Tensor | None = None,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Gather the windows starting at `starting_idxs` into input and target batches.
+
+    All batch_size * (context_length + 1) tokens are read with one fancy index
+    into `dataset` and cast into a single int64 buffer, pinned when `device`
+    is CUDA. x and y are overlapping views of that buffer (so they are not
+    contiguous), and the buffer is transferred to `device` in one copy.
+
+    Args:
+        dataset: npt.NDArray
+            The token ids, usually a np.memmap.
+        starting_idxs: torch.Tensor
+            The first token of every window.
+        context_length: int
+            The number of tokens in every input and target row.
+        device: str
+            The device to put the batch on.
+        buffer: torch.Tensor | None
+            Optional int64 CPU tensor of shape (len(starting_idxs), context_length + 1)
+            to gather into. It must not be overwritten while the returned batch, or
+            its transfer to `device`, is still in use. A new buffer is allocated if None.
+    """
+    batch_size = len(starting_idxs)
+    if buffer is None:
+        buffer = torch.empty((batch_size, context_length + 1), dtype=torch.int64, pin_memory="cuda" in device)
+    idxs = starting_idxs.numpy()[:, None] + np.arange(context_length + 1)
+    np.copyto(buffer.numpy(), dataset[idxs], casting="unsafe")
     if "cuda" in device:
-        x = x.pin_memory().to(device, non_blocking=True)
-        y = y.pin_memory().to(device, non_blocking=True)
+        buffer = buffer.to(device, non_blocking=True)
     else:
-        x = x.to(device)
-        y = y.to(device)
-    return x, y
+        buffer = buffer.to(device)
+    return buffer[:, :-1], buffer[:, 1:]
+
+
+class IndexedTokens:
+    """A tokenized `.bin` file together with the document index written next to it.
+
+    The index is written by `cs336_data.tokenization.tokenize_to_bin`:
+    `<name>.idx` holds num_documents + 1 uint64 offsets, document i spanning
+    tokens [offsets[i], offsets[i + 1]), and the optional `<name>.meta.npy`
+    holds one structured row of metadata per document (its source shard and
+    e.g. a quality score). Everything is memory-mapped, so sampling reads
+    only the offsets of the sampled documents and never scans the tokens.
+
+    Args:
+        bin_path: str | os.PathLike
+            The tokenized `.bin` file.
+        weights: npt.ArrayLike | None
+            Optional non-negative sampling weight per document, e.g. derived
+            from `metadata`. Documents with weight 0 are never sampled.
+        dtype: npt.DTypeLike
+            The dtype of the tokens.
+    """
+
+    def __init__(
+        self, bin_path: str | os.PathLike, weights: npt.ArrayLike | None = None, dtype: npt.DTypeLike = np.uint16
+    ):
+        bin_path = Path(bin_path)
+        self.tokens = np.memmap(bin_path, dtype=dtype, mode="r")
+        self.offsets = np.memmap(bin_path.with_suffix(".idx"), dtype=np.uint64, mode="r")
+        metadata_path = bin_path.with_suffix(".meta.npy")
+        self.metadata = np.load(metadata_path, mmap_mode="r") if metadata_path.exists() else None
+        if int(self.offsets[-1]) != len(self.tokens):
+            raise ValueError(f"{bin_path} has {len(self.tokens)} tokens but its index ends at {int(self.offsets[-1])}")
+        self.set_weights(weights)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def document(self, i: int) -> npt.NDArray:
+        return self.tokens[int(self.offsets[i]) : int(self.offsets[i + 1])]
+
+    def document_lengths(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.offsets).astype(np.int64)
+
+    def set_weights(self, weights: npt.ArrayLike | None) -> None:
+        """Sample documents in proportion to `weights`, or uniformly if None."""
+        if weights is None:
+            self._cumulative_weights = None
+            return
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(self),) or (weights < 0).any():
+            raise ValueError(f"Expected {len(self)} non-negative document weights")
+        cumulative_weights = np.cumsum(weights)
+        if cumulative_weights[-1] <= 0:
+            raise ValueError("At least one document needs a positive weight")
+        # Inverse transform sampling, since torch.multinomial is limited to 2^24 categories.
+        self._cumulative_weights = torch.from_numpy(cumulative_weights)
+
+    def sample_documents(self, n: int, generator: torch.Generator | None = None) -> torch.Tensor:
+        if self._cumulative_weights is None:
+            return torch.randint(len(self), (n,), generator=generator)
+        u = torch.rand(n, dtype=torch.float64, generator=generator) * self._cumulative_weights[-1]
+        return torch.searchsorted(self._cumulative_weights, u, right=True).clamp_(max=len(self) - 1)
+
+    def sample_starts(
+        self,
+        batch_size: int,
+        context_length: int,
+        document_aligned: bool = True,
+        generator: torch.Generator | None = None,
+    ) -> torch.Tensor:
+        """Sample the first token of `batch_size` windows from sampled documents.
+
+        Windows start at the beginning of their document if `document_aligned`,
+        and at a uniformly random position inside it otherwise. Windows run
+        past the end of short documents into the following ones.
+        """
+        documents = self.sample_documents(batch_size, generator).numpy()
+        starts = torch.from_numpy(self.offsets[documents].astype(np.int64))
+        if not document_aligned:
+            lengths = torch.from_numpy((self.offsets[documents + 1] - self.offsets[documents]).astype(np.int64))
+            starts += (torch.rand(batch_size, dtype=torch.float64, generator=generator) * lengths).long()
+        return starts.clamp_(max=len(self.tokens) - context_length - 1)
+
+    def get_batch(
+        self,
+        batch_size: int,
+        context_length: int,
+        device: str,
+        document_aligned: bool = True,
+        generator: torch.Generator | None = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Like `get_batch`, but with windows sampled by `sample_starts`."""
+        starts = self.sample_starts(batch_size, context_length, document_aligned, generator)
+        return batch_from_starts(self.tokens, starts, context_length, device)
+
+
+@dataclass
+class LoaderStats:
+    batches: int = 0
+    # Number of batches that were not ready when requested, and the time spent waiting for them.
+    waits: int = 0
+    wait_seconds: float = 0.0
+
+
+class BatchLoader:
+    """Assemble training batches in a background thread, ahead of the training loop.
+
+    The thread samples window starts with its own generator seeded with
+    `seed`, so with DDP every rank should pass its own seed (e.g.
+    cfg.training.seed + rank) to see different but reproducible batches. It
+    gathers every batch into one of queue_depth + 2 CPU buffers (pinned for
+    CUDA), keeping up to `queue_depth` batches ready. `next(loader)` hands out
+    the oldest ready batch, transferring it to `device` without blocking.
+
+    The buffers are double-buffered on the consumer side: a batch stays valid
+    until two more batches have been taken, so the training loop can hold the
+    current batch while it fetches the next one, as `scripts/train.py` does.
+
+    Args:
+        dataset: npt.NDArray | IndexedTokens
+            The token ids, or an `IndexedTokens` whose `sample_starts` picks the windows.
+        batch_size: int
+            The number of windows per batch.
+        context_length: int
+            The number of tokens in every input and target row.
+        device: str
+            The device to put batches on.
+        seed: int
+            The seed of the sampling generator.
+        queue_depth: int
+            The number of batches to prepare ahead of the training loop.
+    """
+
+    def __init__(
+        self,
+        dataset: npt.NDArray | IndexedTokens,
+        batch_size: int,
+        context_length: int,
+        device: str,
+        seed: int,
+        queue_depth: int = 2,
+    ):
+        if queue_depth < 1:
+            raise ValueError(f"queue_depth must be positive, got {queue_depth}")
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.context_length = context_length
+        self.device = device
+        self.stats = LoaderStats()
+        self._generator = torch.Generator().manual_seed(seed)
+        pin_memory = "cuda" in device
+        self._buffers = [
+            torch.empty((batch_size, context_length + 1), dtype=torch.int64, pin_memory=pin_memory)
+            for _ in range(queue_depth + 2)
+        ]
+        # Transfers out of each buffer, which must finish before the buffer is refilled.
+        self._transfers: list[torch.cuda.Event | None] = [None] * len(self._buffers)
+        self._free: queue.SimpleQueue[int | None] = queue.SimpleQueue()
+        for index in range(len(self._buffers)):
+            self._free.put(index)
+        self._ready: queue.SimpleQueue[int | BaseException] = queue.SimpleQueue()
+        self._held: deque[int] = deque()
+        self._thread = threading.Thread(target=self._fill, name="BatchLoader", daemon=True)
+        self._thread.start()
+
+    def _sample_starts(self) -> torch.Tensor:
+        if isinstance(self.dataset, IndexedTokens):
+            return self.dataset.sample_starts(self.batch_size, self.context_length, generator=self._generator)
+        return torch.randint(len(self.dataset) - self.context_length, (self.batch_size,), generator=self._generator)
+
+    def _fill(self) -> None:
+        tokens = self.dataset.tokens if isinstance(self.dataset, IndexedTokens) else self.dataset
+        try:
+            while (index := self._free.get()) is not None:
+                if self._transfers[index] is not None:
+                    self._transfers[index].synchronize()
+                batch_from_starts(tokens, self._sample_starts(), self.context_length, "cpu", self._buffers[index])
+                self._ready.put(index)
+        except BaseException as e:
+            self._ready.put(e)
+
+    def __iter__(self) -> BatchLoader:
+        return self
+
+    def __next__(self) -> tuple[torch.Tensor, torch.Tensor]:
+        try:
+            index = self._ready.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            index = self._ready.get()
+            self.stats.waits += 1
+            self.stats.wait_seconds += time.perf_counter() - start
+        if isinstance(index, BaseException):
+            # Leave the error in place, so later calls fail too instead of blocking.
+            self._ready.put(index)
+            raise RuntimeError("BatchLoader failed to assemble a batch") from index
+        self.stats.batches += 1
+
+        buffer = self._buffers[index]
+        if "cuda" in self.device:
+            buffer = buffer.to(self.device, non_blocking=True)
+            self._transfers[index] = torch.cuda.Event()
+            self._transfers[index].record()
+        self._held.append(index)
+        if len(self._held) > 2:
+            self._free.put(self._held.popleft())
+        return buffer[:, :-1], buffer[:, 1:]
+
+    def close(self) -> None:
+        self._free.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> BatchLoader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -49,6 +49,8 @@ class TrainingConfig:
     wandb_project: str | None = None
     wandb_entity: str | None = None
     log_interval: int = 20
+    # Number of training batches assembled ahead of the training loop by a background thread.
+    prefetch_depth: int = 2
     save_checkpoints: bool = False
 
 @dataclass
@@ -40,7 +40,7 @@ from torch.nn.parallel import DistributedDataParallel as DDP
 from tqdm import tqdm, trange
 
 import wandb
-from cs336_basics.data import get_batch
+from cs336_basics.data import BatchLoader, get_batch
 from cs336_basics.model import BasicsTransformerLM
 from cs336_basics.optimizer import get_cosine_lr
 from cs336_basics.train_config import Config, register_configs
@@ -171,13 +171,18 @@ def main(cfg: Config) -> None:
         fused=True,
     )
 
-    # Get the first batch
-    batch_x, batch_y = get_batch(
+    # Assemble training batches in a background thread, with a generator seeded per rank.
+    train_loader = BatchLoader(
         train_data,
         batch_size=cfg.training.train_batch_size,
         context_length=cfg.model.context_length,
         device=cfg.training.device,
+        seed=seed,
+        queue_depth=cfg.training.prefetch_depth,
     )
+
+    # Get the first batch
+    batch_x, batch_y = next(train_loader)
     for i in (pbar := trange(cfg.training.train_steps, desc="Training", disable=not is_master_process)):
         lr = get_cosine_lr(
             i,
@@ -197,17 +202,12 @@ def main(cfg: Config) -> None:
             with amp_ctx:
                 logits = model(batch_x)
 
-                # immediately async prefetch next batch while model is doing the forward pass on the GPU
-                next_batch_x, next_batch_y = get_batch(
-                    train_data,
-                    batch_size=cfg.training.train_batch_size,
-                    context_length=cfg.model.context_length,
-                    device=cfg.training.device,
-                )
+                # immediately start copying the next batch to the GPU while the model is doing the forward pass
+                next_batch_x, next_batch_y = next(train_loader)
 
                 # Calculate the loss with the logits
                 loss = (
-                    F.cross_entropy(logits.view(-1, logits.size(-1)), batch_y.view(-1))
+                    F.cross_entropy(logits.view(-1, logits.size(-1)), batch_y.reshape(-1))
                     / cfg.training.gradient_accumulation_steps
                 )
 
@@ -227,7 +227,15 @@ def main(cfg: Config) -> None:
         if is_master_process:
             pbar.set_description(f"Training step {i}, Loss: {loss_float:.4f}")
             if cfg.training.wandb_project and i % cfg.training.log_interval == 0:
-                wandb.log({"train_loss": loss_float, "lr": lr}, step=i)
+                wandb.log(
+                    {
+                        "train_loss": loss_float,
+                        "lr": lr,
+                        "data_waits": train_loader.stats.waits,
+                        "data_wait_seconds": train_loader.stats.wait_seconds,
+                    },
+                    step=i,
+                )
 
         if i != 0 and i % cfg.training.eval_interval == 0 and is_master_process:
             dev_loss = estimate_dev_loss(
@@ -254,6 +262,13 @@ def main(cfg: Config) -> None:
                 # Write weights:
                 torch.save(model.state_dict(), model_weights_output_path)
 
+    train_loader.close()
+    if is_master_process:
+        logger.info(
+            f"Waited for {train_loader.stats.waits} of {train_loader.stats.batches} training batches, "
+            f"{train_loader.stats.wait_seconds:.1f}s in total"
+        )
+
     # Calculate final estimated dev loss
     if is_master_process:
         dev_loss = estimate_dev_loss(
@@ -296,7 +311,7 @@ def estimate_dev_loss(
             device=device,
         )
         logits = model(batch_x)
-        loss = F.cross_entropy(logits.view(-1, logits.size(-1)), batch_y.view(-1))
+        loss = F.cross_entropy(logits.view(-1, logits.size(-1)), batch_y.reshape(-1))
         losses[k] = loss.item()
 
     model.train()
@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import mmh3
+import numpy as np
+import numpy.typing as npt
+from xopen import xopen
+
+from cs336_data.parallel import bounded_imap_unordered
+from cs336_data.segments import list_segments, next_segment_prefix, write_segment
+
+logger = logging.getLogger(__name__)
+
+HASH_SEED = 0
+
+# Counts saturate here; deduplication only needs to tell 1 from "more than 1".
+MAX_COUNT = np.iinfo(np.uint8).max
+
+
+def line_hashes(lines: list[bytes]) -> npt.NDArray[np.uint64]:
+    """
+    Hash lines to unsigned 64-bit MurmurHash3 values, ignoring trailing line breaks.
+
+    Args:
+        lines: Raw lines, as read from a file opened in binary mode
+
+    Returns:
+        Array with one hash per line
+    """
+    return np.fromiter(
+        (mmh3.hash64(line.rstrip(b"\r\n"), HASH_SEED, signed=False)[0] for line in lines),
+        dtype=np.uint64,
+        count=len(lines),
+    )
+
+
+def iter_line_chunks(path: str | os.PathLike, chunk_lines: int = 1 << 16) -> Iterator[list[bytes]]:
+    """Stream the lines of a (possibly compressed) file in lists of at most `chunk_lines`."""
+    with xopen(path, "rb") as f:
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) == chunk_lines:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def hash_shards(hashes: npt.NDArray[np.uint64], num_shards: int) -> npt.NDArray[np.uint64]:
+    """
+    Assign hashes to `num_shards` contiguous ranges of the hash space by their high bits.
+
+    Because shards are ranges, a sorted array of hashes is also sorted by shard,
+    and the sorted tables of all shards concatenate into one sorted table.
+    """
+    return ((hashes >> np.uint64(32)) * np.uint64(num_shards)) >> np.uint64(32)
+
+
+def shard_range(keys: npt.NDArray[np.uint64], shard: int, num_shards: int) -> tuple[int, int]:
+    """Find the slice of sorted `keys` that `hash_shards` assigns to `shard`, in O(log n)."""
+
+    def start(shard: int) -> int:
+        # Smallest hash whose high 32 bits h satisfy h * num_shards >> 32 >= shard
+        first = -(-(shard << 32) // num_shards) << 32
+        return len(keys) if first >= 1 << 64 else int(np.searchsorted(keys, np.uint64(first)))
+
+    return start(shard), start(shard + 1)
+
+
+def lookup_counts(
+    keys: npt.NDArray[np.uint64], counts: npt.NDArray[np.uint8], hashes: npt.NDArray[np.uint64]
+) -> npt.NDArray[np.uint8]:
+    """Look up `hashes` in sorted `keys` (may be memory-mapped), returning 0 for missing hashes."""
+    idx = np.searchsorted(keys, hashes)
+    found = idx < len(keys)
+    found[found] = keys[idx[found]] == hashes[found]
+    result = np.zeros(len(hashes), dtype=np.uint8)
+    result[found] = counts[idx[found]]
+    return result
+
+
+class LineHashCounter:
+    """
+    Counter of 64-bit hashes backed by sorted runs of two parallel arrays.
+
+    Keys are kept in sorted uint64 arrays with saturating uint8 counts next to
+    them, so the counter costs 9 bytes per distinct hash. Added hashes are
+    buffered and, once `buffer_size` of them have accumulated, turned into a
+    new sorted run. Runs are merged like a binary counter: whenever the newest
+    run is at least half as large as the one before it, the two are merged.
+    Every hash is therefore merged O(log n) times in total, instead of once
+    per flush, and there are never more than O(log n) runs to search.
+    """
+
+    def __init__(self, buffer_size: int = 1 << 22):
+        self.buffer_size = buffer_size
+        self.peak_nbytes = 0
+        self._runs: list[tuple[npt.NDArray[np.uint64], npt.NDArray[np.uint8]]] = []
+        self._buffer: list[tuple[npt.NDArray[np.uint64], npt.NDArray | None]] = []
+        self._buffered = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def keys(self) -> npt.NDArray[np.uint64]:
+        """Sorted distinct hashes; merges all runs into one."""
+        self._consolidate()
+        return self._runs[0][0] if self._runs else np.empty(0, dtype=np.uint64)
+
+    @property
+    def counts(self) -> npt.NDArray[np.uint8]:
+        """Saturated counts of `keys`; updates to this array are kept."""
+        self._consolidate()
+        return self._runs[0][1] if self._runs else np.empty(0, dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(keys.nbytes + counts.nbytes for keys, counts in self._runs) + self._buffered * 9
+
+    def add(self, hashes: npt.NDArray[np.uint64], counts: npt.NDArray | None = None) -> None:
+        """
+        Count `hashes`, each once or, if given, `counts` times.
+
+        Args:
+            hashes: Hashes to count
+            counts: Optional per-hash multiplicities, e.g. from an already aggregated table
+        """
+        self._buffer.append((hashes, counts))
+        self._buffered += len(hashes)
+        self.peak_nbytes = max(self.peak_nbytes, self.nbytes)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Turn buffered hashes into a sorted run, merging runs of similar sizes."""
+        if not self._buffer:
+            return
+        hashes = np.concatenate([batch for batch, _ in self._buffer])
+        if all(counts is None for _, counts in self._buffer):
+            new_keys, new_counts = np.unique(hashes, return_counts=True)
+        else:
+            weights = np.concatenate(
+                [np.ones(len(batch), dtype=np.int64) if counts is None else counts for batch, counts in self._buffer]
+            )
+            new_keys, inverse = np.unique(hashes, return_inverse=True)
+            new_counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        self.peak_nbytes = max(self.peak_nbytes, self.nbytes + hashes.nbytes + new_keys.nbytes + new_counts.nbytes)
+        del hashes
+        self._buffer = []
+        self._buffered = 0
+        self._runs.append((new_keys, np.minimum(new_counts, MAX_COUNT).astype(np.uint8)))
+        while len(self._runs) > 1 and 2 * len(self._runs[-1][0]) >= len(self._runs[-2][0]):
+            self._merge_last_runs()
+
+    def _merge_last_runs(self) -> None:
+        # The newest run is never larger than twice the one before it, so the merge is linear in their sizes.
+        (keys, counts), (new_keys, new_counts) = self._runs[-2:]
+        idx = np.searchsorted(keys, new_keys)
+        present = idx < len(keys)
+        present[present] = keys[idx[present]] == new_keys[present]
+        counts[idx[present]] = np.minimum(counts[idx[present]].astype(np.int64) + new_counts[present], MAX_COUNT)
+        absent = ~present
+        merged_keys = np.insert(keys, idx[absent], new_keys[absent])
+        merged_counts = np.insert(counts, idx[absent], new_counts[absent])
+        # The old runs are alive until the inserts return, next to the merged run and the insert positions.
+        merge_nbytes = self.nbytes + merged_keys.nbytes + merged_counts.nbytes + idx.nbytes
+        self.peak_nbytes = max(self.peak_nbytes, merge_nbytes)
+        self._runs[-2:] = [(merged_keys, merged_counts)]
+
+    def _consolidate(self) -> None:
+        self.flush()
+        while len(self._runs) > 1:
+            self._merge_last_runs()
+
+    def counts_of(self, hashes: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint8]:
+        """Look up the (saturated) counts of `hashes`, 0 for hashes never added."""
+        self.flush()
+        total = np.zeros(len(hashes), dtype=np.int64)
+        for keys, counts in self._runs:
+            total += lookup_counts(keys, counts, hashes)
+        return np.minimum(total, MAX_COUNT).astype(np.uint8)
+
+
+class LineHashIndex:
+    """
+    Line hash counts persisted across runs as a directory of immutable segments.
+
+    Every deduplication run against the index appends one segment with the
+    sorted hashes and counts of its own lines, stored like a flushed
+    `LineHashCounter`. Lookups binary-search each memory-mapped segment, so a
+    run costs time in the size of its new data rather than of the whole
+    history. `compact` merges the segments once there are many of them.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments = list_segments(self.directory)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def counts_of(self, hashes: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint8]:
+        """Look up the (saturated) number of times each hash was seen in previous runs."""
+        total = np.zeros(len(hashes), dtype=np.int64)
+        for prefix in self.segments:
+            keys = np.load(f"{prefix}.keys.npy", mmap_mode="r")
+            counts = np.load(f"{prefix}.counts.npy", mmap_mode="r")
+            total += lookup_counts(keys, counts, hashes)
+        return np.minimum(total, MAX_COUNT).astype(np.uint8)
+
+    def add_segment(self, keys: npt.NDArray[np.uint64], counts: npt.NDArray[np.uint8]) -> None:
+        """Persist the sorted hash table of one run as a new segment."""
+        prefix = next_segment_prefix(self.directory, self.segments)
+        write_segment(prefix, keys, {"counts": counts})
+        self.segments.append(prefix)
+
+    def compact(self) -> None:
+        """Merge all segments into a single one."""
+        if len(self.segments) < 2:
+            return
+        counter = LineHashCounter()
+        for prefix in self.segments:
+            counter.add(np.load(f"{prefix}.keys.npy"), np.load(f"{prefix}.counts.npy"))
+        counter.flush()
+        old_segments = list(self.segments)
+        self.add_segment(counter.keys, counter.counts)
+        for prefix in old_segments:
+            for suffix in (".keys.npy", ".counts.npy"):
+                os.remove(f"{prefix}{suffix}")
+        self.segments = self.segments[-1:]
+
+
+def _add_history_counts(
+    keys: npt.NDArray[np.uint64], counts: npt.NDArray[np.uint8], index: LineHashIndex, chunk_size: int = 1 << 22
+) -> None:
+    """Add the counts seen in previous runs to a (possibly memory-mapped) hash table in place."""
+    for start in range(0, len(keys), chunk_size):
+        history = index.counts_of(np.asarray(keys[start : start + chunk_size]))
+        counts[start : start + chunk_size] = np.minimum(
+            counts[start : start + chunk_size].astype(np.int64) + history, MAX_COUNT
+        )
+
+
+@dataclass
+class LineDedupStats:
+    """Summary of an exact line deduplication run."""
+
+    num_files: int = 0
+    num_lines: int = 0
+    num_kept_lines: int = 0
+    num_unique_hashes: int = 0
+    counter_peak_bytes: int = 0
+    peak_rss_bytes: int = 0
+    seconds: float = 0.0
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the current process (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _rewrite_unique_lines(
+    path: Path,
+    output_path: Path,
+    keys: npt.NDArray[np.uint64],
+    counts: npt.NDArray[np.uint8],
+    chunk_lines: int,
+) -> int:
+    num_kept_lines = 0
+    with xopen(output_path, "wb") as out:
+        for lines in iter_line_chunks(path, chunk_lines):
+            keep = lookup_counts(keys, counts, line_hashes(lines)) == 1
+            out.writelines(line for line, keep_line in zip(lines, keep) if keep_line)
+            num_kept_lines += int(keep.sum())
+    return num_kept_lines
+
+
+def _spill_file_hashes(args: tuple[Path, Path, int]) -> tuple[int, int]:
+    """Write the sorted distinct line hashes of one file and their counts to `spill_prefix`.{keys,counts}.npy."""
+    path, spill_prefix, chunk_lines = args
+    counter = LineHashCounter()
+    num_lines = 0
+    for lines in iter_line_chunks(path, chunk_lines):
+        counter.add(line_hashes(lines))
+        num_lines += len(lines)
+    counter.flush()
+    np.save(f"{spill_prefix}.keys.npy", counter.keys)
+    np.save(f"{spill_prefix}.counts.npy", counter.counts)
+    return num_lines, peak_rss_bytes()
+
+
+def _count_shard(args: tuple[int, int, list[Path], Path]) -> tuple[int, int, int]:
+    """Merge one hash-prefix shard of every spilled file into `table_prefix`.{keys,counts}.npy."""
+    shard, num_shards, spill_prefixes, table_prefix = args
+    counter = LineHashCounter()
+    for spill_prefix in spill_prefixes:
+        keys = np.load(f"{spill_prefix}.keys.npy", mmap_mode="r")
+        counts = np.load(f"{spill_prefix}.counts.npy", mmap_mode="r")
+        lo, hi = shard_range(keys, shard, num_shards)
+        counter.add(np.array(keys[lo:hi]), np.array(counts[lo:hi]))
+    counter.flush()
+    np.save(f"{table_prefix}.keys.npy", counter.keys)
+    np.save(f"{table_prefix}.counts.npy", counter.counts)
+    return len(counter.keys), counter.peak_nbytes, peak_rss_bytes()
+
+
+def _rewrite_file(args: tuple[Path, Path, Path, int]) -> tuple[int, int]:
+    path, output_path, table_prefix, chunk_lines = args
+    keys = np.load(f"{table_prefix}.keys.npy", mmap_mode="r")
+    counts = np.load(f"{table_prefix}.counts.npy", mmap_mode="r")
+    return _rewrite_unique_lines(path, output_path, keys, counts, chunk_lines), peak_rss_bytes()
+
+
+def _parallel_exact_line_deduplication(
+    input_files: list[Path],
+    output_directory: Path,
+    stats: LineDedupStats,
+    chunk_lines: int,
+    num_workers: int,
+    num_shards: int,
+    work_directory: str | os.PathLike | None,
+    index: LineHashIndex | None,
+) -> None:
+    max_in_flight = 2 * num_workers
+    with (
+        tempfile.TemporaryDirectory(dir=work_directory, prefix="line_dedup_") as tmp,
+        ProcessPoolExecutor(max_workers=num_workers) as executor,
+    ):
+        tmp = Path(tmp)
+        spill_prefixes = [tmp / f"file{i:06d}" for i in range(len(input_files))]
+        spill_args = [(path, prefix, chunk_lines) for path, prefix in zip(input_files, spill_prefixes)]
+        for num_lines, rss in bounded_imap_unordered(executor, _spill_file_hashes, spill_args, max_in_flight):
+            stats.num_lines += num_lines
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, rss)
+
+        shard_prefixes = [tmp / f"shard{shard:05d}" for shard in range(num_shards)]
+        shard_args = [(shard, num_shards, spill_prefixes, prefix) for shard, prefix in enumerate(shard_prefixes)]
+        for num_keys, counter_peak_bytes, rss in executor.map(_count_shard, shard_args):
+            stats.num_unique_hashes += num_keys
+            stats.counter_peak_bytes = max(stats.counter_peak_bytes, counter_peak_bytes)
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, rss)
+
+        # Shards are contiguous hash ranges, so concatenating their sorted tables gives one sorted table.
+        table_prefix = tmp / "lines"
+        for suffix, dtype in ((".keys.npy", np.uint64), (".counts.npy", np.uint8)):
+            table = np.lib.format.open_memmap(
+                f"{table_prefix}{suffix}", mode="w+", dtype=dtype, shape=(stats.num_unique_hashes,)
+            )
+            offset = 0
+            for prefix in shard_prefixes:
+                shard_table = np.load(f"{prefix}{suffix}", mmap_mode="r")
+                table[offset : offset + len(shard_table)] = shard_table
+                offset += len(shard_table)
+            table.flush()
+            del table
+
+        if index is not None:
+            # Keep this run's own counts for the index before adding the history to the shared table.
+            shutil.copyfile(f"{table_prefix}.counts.npy", f"{table_prefix}.run_counts.npy")
+            counts = np.load(f"{table_prefix}.counts.npy", mmap_mode="r+")
+            _add_history_counts(np.load(f"{table_prefix}.keys.npy", mmap_mode="r"), counts, index)
+            counts.flush()
+            del counts
+
+        rewrite_args = [(path, output_directory / path.name, table_prefix, chunk_lines) for path in input_files]
+        for num_kept_lines, rss in bounded_imap_unordered(executor, _rewrite_file, rewrite_args, max_in_flight):
+            stats.num_kept_lines += num_kept_lines
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, rss)
+
+        if index is not None:
+            index.add_segment(
+                np.load(f"{table_prefix}.keys.npy", mmap_mode="r"),
+                np.load(f"{table_prefix}.run_counts.npy", mmap_mode="r"),
+            )
+
+
+def exact_line_deduplication(
+    input_files: Iterable[str | os.PathLike],
+    output_directory: str | os.PathLike,
+    chunk_lines: int = 1 << 16,
+    num_workers: int = 1,
+    num_shards: int | None = None,
+    work_directory: str | os.PathLike | None = None,
+    index_directory: str | os.PathLike | None = None,
+) -> LineDedupStats:
+    """
+    Remove every line that occurs more than once across the whole corpus.
+
+    The first pass streams all files and counts 64-bit hashes of their lines in
+    a `LineHashCounter`, so memory grows with the number of distinct lines
+    (9 bytes each) rather than their total size. The second pass rewrites each
+    file to `output_directory` under the same name, keeping only the lines
+    whose hash was seen exactly once.
+
+    With `num_workers > 1` both passes run in a process pool. Each worker
+    first hashes one input file and spills its sorted hash counts to
+    `work_directory`; the hash space is then split by prefix into `num_shards`
+    ranges that are counted by separate workers, and the merged count table is
+    memory-mapped by the workers that rewrite the files in parallel.
+
+    With an `index_directory`, lines also count as duplicates if they were
+    seen by earlier runs against the same `LineHashIndex`, and the line hashes
+    of this run are added to the index afterwards. Outputs of earlier runs are
+    left untouched, so a line seen first in an earlier run is kept there.
+
+    Args:
+        input_files: Paths of the documents to deduplicate
+        output_directory: Directory to write the deduplicated documents to
+        chunk_lines: Number of lines hashed per batch
+        num_workers: Number of worker processes; 1 runs everything in this process
+        num_shards: Number of hash-prefix shards (defaults to `num_workers`)
+        work_directory: Where to put intermediate files (defaults to the system temp directory)
+        index_directory: Directory of a `LineHashIndex` persisting line counts across runs
+
+    Returns:
+        Line counts, counter size and peak memory of the run
+    """
+    start = time.perf_counter()
+    input_files = [Path(path) for path in input_files]
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    stats = LineDedupStats(num_files=len(input_files))
+    index = LineHashIndex(index_directory) if index_directory is not None else None
+
+    if num_workers > 1:
+        _parallel_exact_line_deduplication(
+            input_files,
+            output_directory,
+            stats,
+            chunk_lines,
+            num_workers,
+            num_shards or num_workers,
+            work_directory,
+            index,
+        )
+        _finish_stats(stats, start)
+        return stats
+
+    counter = LineHashCounter()
+    for path in input_files:
+        for lines in iter_line_chunks(path, chunk_lines):
+            counter.add(line_hashes(lines))
+            stats.num_lines += len(lines)
+    stats.num_unique_hashes = len(counter)
+
+    counts = counter.counts
+    if index is not None:
+        counts = counts.copy()
+        _add_history_counts(counter.keys, counts, index)
+    for path in input_files:
+        stats.num_kept_lines += _rewrite_unique_lines(
+            path, output_directory / path.name, counter.keys, counts, chunk_lines
+        )
+    if index is not None:
+        index.add_segment(counter.keys, counter.counts)
+
+    stats.counter_peak_bytes = counter.peak_nbytes
+    _finish_stats(stats, start)
+    return stats
+
+
+def _finish_stats(stats: LineDedupStats, start: float) -> None:
+    stats.peak_rss_bytes = max(stats.peak_rss_bytes, peak_rss_bytes())
+    stats.seconds = time.perf_counter() - start
+    logger.info(
+        "Kept %d of %d lines from %d files (%d distinct hashes, counter peak %.1f MB, peak RSS %.1f MB)",
+        stats.num_kept_lines,
+        stats.num_lines,
+        stats.num_files,
+        stats.num_unique_hashes,
+        stats.counter_peak_bytes / 1e6,
+        stats.peak_rss_bytes / 1e6,
+    )
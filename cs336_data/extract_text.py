@@ -1,25 +1,194 @@
-import fastwarc
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+
 import resiliparse
 from fastwarc import ArchiveIterator, WarcRecordType
-from resiliparse import extract, parse
 from resiliparse.extract import html2text
 from resiliparse.parse import encoding
-from resiliparse.parse.encoding import detect_encoding, bytes_to_str
+from resiliparse.parse.encoding import bytes_to_str, map_encoding_to_html5
+
+from cs336_data.parallel import bounded_imap_unordered
+
+logger = logging.getLogger(__name__)
+
+# (record_id, url, text) for a single extracted WARC record.
+ExtractedRecord = tuple[str, str, str]
+
+# Encoding detection only looks at this many leading bytes of a page.
+ENCODING_DETECTION_BYTES = 16384
+
+# Records with a declared Content-Type outside of these are skipped without being decoded.
+HTML_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml"})
 
 
+@dataclass
+class ShardStats:
+    """Throughput of extracting a single WARC shard."""
+
+    path: str
+    num_records: int
+    num_bytes: int
+    seconds: float
+
+    @property
+    def records_per_second(self) -> float:
+        return self.num_records / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.num_bytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
 
 def detect_encoding(text: bytes) -> str:
-    return resiliparse.parse.encoding.detect_encoding(text)
+    return resiliparse.parse.encoding.detect_encoding(text[:ENCODING_DETECTION_BYTES], max_len=ENCODING_DETECTION_BYTES)
+
+@lru_cache(maxsize=256)
+def declared_encoding(charset: str | None) -> str | None:
+    """Map a declared HTTP charset to its WHATWG encoding name, or None if it is missing or unknown."""
+    return map_encoding_to_html5(charset.strip().strip('"\''), fallback_utf8=False) if charset else None
+
+def extract_text(html_bytes: bytes, charset: str | None = None) -> str:
+    """
+    Extract plain text from an HTML page.
 
-def extract_text(unicode_text: str) -> str:
-    return resiliparse.extract.html2text.extract_plain_text(bytes_to_str(unicode_text, detect_encoding(unicode_text)))
+    Args:
+        html_bytes: Raw page bytes
+        charset: Charset declared for the page, e.g. by its HTTP Content-Type header. It
+            is used if valid; otherwise the encoding is detected from a prefix of the page.
 
-def extract_text_from_warc(warc_file: str) -> str:
-    i = 0
+    Returns:
+        Extracted text
+    """
+    charset = declared_encoding(charset) or detect_encoding(html_bytes)
+    return resiliparse.extract.html2text.extract_plain_text(bytes_to_str(html_bytes, charset))
+
+def is_html(content_type: str | None) -> bool:
+    """Whether a record with this HTTP Content-Type may be HTML; records without one are kept."""
+    return not content_type or content_type.split(';', 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+def _read_records(warc_file: str | os.PathLike) -> Iterator[tuple[str, str, bytes, str | None, bool]]:
     with open(warc_file, 'rb') as f:
-        for record in ArchiveIterator(f, WarcRecordType.response):
-            text = extract_text(record.reader.read())
-            return(text)
+        for record in ArchiveIterator(f, WarcRecordType.response | WarcRecordType.conversion):
+            is_wet = record.record_type == WarcRecordType.conversion
+            if not is_wet and not is_html(record.http_content_type):
+                continue
+            url = record.headers.get('WARC-Target-URI')
+            yield record.record_id, url, record.reader.read(), record.http_charset, is_wet
+
+def _extract_record(record: tuple[str, str, bytes, str | None, bool]) -> ExtractedRecord:
+    record_id, url, payload, charset, is_wet = record
+    # WET conversion records already hold Common Crawl's UTF-8 plain text extraction.
+    text = bytes_to_str(payload, 'utf-8') if is_wet else extract_text(payload, charset)
+    return record_id, url, text
+
+def extract_text_from_warc(warc_file: str | os.PathLike, num_threads: int = 1) -> Iterator[ExtractedRecord]:
+    """
+    Stream the text of every document in a WARC or WET file.
+
+    HTML response records of WARC files are extracted; records whose declared
+    Content-Type is not HTML are skipped before their payload is decoded.
+    Conversion records of WET files already contain plain text, which is
+    yielded as is, so WET shards skip HTML extraction entirely. A file may mix
+    both kinds of records.
+
+    With `num_threads > 1`, records are read sequentially and extracted by a
+    thread pool a few batches at a time; resiliparse releases the GIL while it
+    parses, so the threads run in parallel.
+
+    Args:
+        warc_file: Path to a (possibly compressed) WARC or WET file
+        num_threads: Number of extraction threads
+
+    Yields:
+        (record_id, url, text) for each document, in file order
+    """
+    records = _read_records(warc_file)
+    if num_threads <= 1:
+        yield from map(_extract_record, records)
+        return
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        while batch := list(islice(records, 4 * num_threads)):
+            yield from executor.map(_extract_record, batch)
+
+
+def _extract_shard(args: tuple[str, str]) -> tuple[str, ShardStats]:
+    """Extract a shard into a JSONL spill file, one record at a time, and return only its path and stats."""
+    warc_file, spill_path = args
+    start = time.perf_counter()
+    num_records = 0
+    with open(spill_path, 'w', encoding='utf-8') as f:
+        for record in extract_text_from_warc(warc_file):
+            f.write(json.dumps(record) + '\n')
+            num_records += 1
+    stats = ShardStats(
+        path=warc_file,
+        num_records=num_records,
+        num_bytes=os.path.getsize(warc_file),
+        seconds=time.perf_counter() - start,
+    )
+    return spill_path, stats
+
+
+def extract_text_from_warcs(
+    warc_files: Iterable[str | os.PathLike],
+    num_workers: int | None = None,
+    max_in_flight: int | None = None,
+    shard_stats: list[ShardStats] | None = None,
+    work_directory: str | os.PathLike | None = None,
+) -> Iterator[ExtractedRecord]:
+    """
+    Extract text from many WARC or WET shards in parallel, one shard per worker process.
+
+    Workers write the records of their shard to a spill file in a temporary
+    directory and only send back its path, so neither a worker nor this
+    process ever holds more than one record, however large a shard is.
+    Shards are handed to the pool lazily and at most `max_in_flight` of them
+    are submitted or waiting to be read at once, which bounds the spill files
+    on disk to a few shards' worth of extracted text. Records are yielded
+    shard by shard in completion order.
 
+    Args:
+        warc_files: Paths to WARC or WET shards, which may be mixed
+        num_workers: Number of worker processes (defaults to the CPU count)
+        max_in_flight: Maximum number of shards submitted at once (defaults to 2 * num_workers)
+        shard_stats: If given, the throughput of every finished shard is appended here
+        work_directory: Where to put the spill files (defaults to the system temp directory)
 
-extract_text_from_warc(r'/Users/rigvedavangipurapu/Documents/Stanford CS336 assignment 4/cs336-assignment4data/cs336_data/CC-MAIN-20250417135010-20250417165010-00065.warc.gz')
\ No newline at end of file
+    Yields:
+        (record_id, url, text) for each document
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * num_workers
+    with (
+        tempfile.TemporaryDirectory(dir=work_directory, prefix='extract_') as tmp,
+        ProcessPoolExecutor(max_workers=num_workers) as executor,
+    ):
+        tasks = (
+            (os.fspath(warc_file), os.path.join(tmp, f'shard{index:06d}.jsonl'))
+            for index, warc_file in enumerate(warc_files)
+        )
+        for spill_path, stats in bounded_imap_unordered(executor, _extract_shard, tasks, max_in_flight):
+            logger.info(
+                "Extracted %d records from %s in %.1fs (%.1f records/s, %.2f MB/s)",
+                stats.num_records,
+                stats.path,
+                stats.seconds,
+                stats.records_per_second,
+                stats.mb_per_second,
+            )
+            if shard_stats is not None:
+                shard_stats.append(stats)
+            with open(spill_path, encoding='utf-8') as f:
+                for line in f:
+                    yield tuple(json.loads(line))
+            os.remove(spill_path)
@@ -1,23 +1,44 @@
-import fasttext
-import fastwarc
-import resiliparse
-from fastwarc import ArchiveIterator, WarcRecordType
-from resiliparse import extract, parse
-from resiliparse.extract import html2text
-from resiliparse.parse import encoding
-from resiliparse.parse.encoding import detect_encoding, bytes_to_str
+from __future__ import annotations
 
+from collections.abc import Sequence
 
-model_hatespeech = fasttext.load_model('/Users/rigvedavangipurapu/Documents/Stanford CS336 assignment 4/jigsaw_fasttext_bigrams_hatespeech_final.bin')
-model_offensive = fasttext.load_model('/Users/rigvedavangipurapu/Documents/Stanford CS336 assignment 4/jigsaw_fasttext_bigrams_nsfw_final.bin')
+import numpy as np
+import numpy.typing as npt
 
-def identify_hatespeech(unicode_text: str) -> str:
-    labels, prob = model_hatespeech.predict(unicode_text)
-    return labels[0].replace('__label__', ''), prob[0]
+from cs336_data.models import predict_batch
 
-def identify_nsfw(unicode_text: str) -> str:
-    labels, prob = model_offensive.predict(unicode_text)
-    return labels[0].replace('__label__', ''), prob[0]
+# Models run by `classify_harmful_batch`, in the order of its output columns.
+HARMFUL_MODELS = ('hatespeech', 'nsfw')
 
-print(identify_hatespeech("I hate you"))
-print(identify_nsfw("Love you")) 
\ No newline at end of file
+
+def identify_hatespeech(unicode_text: str) -> tuple[str, float]:
+    labels, scores = predict_batch(['hatespeech'], [unicode_text], batch_size=1)
+    return str(labels[0, 0]), float(scores[0, 0])
+
+def identify_nsfw(unicode_text: str) -> tuple[str, float]:
+    labels, scores = predict_batch(['nsfw'], [unicode_text], batch_size=1)
+    return str(labels[0, 0]), float(scores[0, 0])
+
+def classify_harmful_batch(
+    texts: Sequence[str], batch_size: int = 1024
+) -> tuple[npt.NDArray[np.str_], npt.NDArray[np.float32]]:
+    """
+    Run the hate speech and NSFW classifiers over many documents.
+
+    Documents are normalized once and sent to both models in chunks of
+    `batch_size`, one fastText call per model and chunk.
+
+    Args:
+        texts: Documents to classify
+        batch_size: Number of documents per fastText call
+
+    Returns:
+        (labels, scores) arrays of shape (len(texts), 2), with one column per
+        model in `HARMFUL_MODELS` order, e.g. labels[i] == ["non-toxic", "nsfw"]
+    """
+    return predict_batch(HARMFUL_MODELS, texts, batch_size)
+
+
+if __name__ == "__main__":
+    print(identify_hatespeech("I hate you"))
+    print(identify_nsfw("Love you"))
@@ -1,43 +1,61 @@
-import fasttext
-import fastwarc
-import resiliparse
-from fastwarc import ArchiveIterator, WarcRecordType
-from resiliparse import extract, parse
-from resiliparse.extract import html2text
-from resiliparse.parse import encoding
-from resiliparse.parse.encoding import detect_encoding, bytes_to_str
-
-
-model = fasttext.load_model('/Users/rigvedavangipurapu/Documents/Stanford CS336 assignment 4/lid.176.bin')
-
-def identify_language(unicode_text: str) -> str:
-    unicode_text = unicode_text.replace('\n', ' ')
-    labels, prob = model.predict(unicode_text)
-    lang_code = labels[0].replace('__label__', '') 
-    probability = prob[0]
-    return lang_code, probability
-
-def detect_encoding(text: bytes) -> str:
-    return resiliparse.parse.encoding.detect_encoding(text)
-
-def extract_text(unicode_text: str) -> str:
-    return resiliparse.extract.html2text.extract_plain_text(bytes_to_str(unicode_text, detect_encoding(unicode_text)))
-
-def extract_language_from_warc(warc_file: str):
+from __future__ import annotations
+
+from collections.abc import Sequence
+from itertools import islice
+
+import numpy as np
+import numpy.typing as npt
+
+from cs336_data.extract_text import extract_text_from_warc
+from cs336_data.models import LABEL_PREFIX, get_model
+
+
+def identify_language(unicode_text: str) -> tuple[str, float]:
+    labels, probs = identify_language_batch([unicode_text])
+    return str(labels[0, 0]), float(probs[0, 0])
+
+def identify_language_batch(
+    texts: Sequence[str], k: int = 1, batch_size: int = 1024
+) -> tuple[npt.NDArray[np.str_], npt.NDArray[np.float32]]:
+    """
+    Identify the language of many documents with batched fastText predictions.
+
+    fastText rejects newlines, so they are replaced with spaces before each
+    chunk of `batch_size` documents is sent to the model in a single call.
+
+    Args:
+        texts: Documents to classify
+        k: Number of most likely languages to return per document
+        batch_size: Number of documents per fastText call
+
+    Returns:
+        (labels, probs) arrays of shape (len(texts), k), sorted by decreasing probability
+    """
+    model = get_model('language_identification')
+    labels = np.empty((len(texts), k), dtype=object)
+    probs = np.empty((len(texts), k), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        chunk = [text.replace('\n', ' ') for text in texts[start : start + batch_size]]
+        chunk_labels, chunk_probs = model.predict(chunk, k=k)
+        end = start + len(chunk)
+        labels[start:end] = [[label[len(LABEL_PREFIX):] for label in doc_labels] for doc_labels in chunk_labels]
+        probs[start:end] = np.asarray(chunk_probs, dtype=np.float32).reshape(len(chunk), k)
+    return labels.astype(np.str_), probs
+
+def extract_language_from_warc(warc_file: str, max_records: int = 20):
+    records = list(islice(extract_text_from_warc(warc_file), max_records))
+    labels, probs = identify_language_batch([text for _, _, text in records])
     results = dict()
-    with open(warc_file, 'rb') as f:
-        for i, record in enumerate(ArchiveIterator(f, WarcRecordType.response)):
-            if i >= 20:
-                break
-            text = extract_text(record.reader.read())
-            results[text[0:25]] = (record.record_id, identify_language(text))
+    for (record_id, _, text), label, prob in zip(records, labels[:, 0], probs[:, 0]):
+        results[text[0:25]] = (record_id, (str(label), float(prob)))
     return results
 
 
-# print(identify_language('¡Hola mundo! 你好世界! Bonjour le monde! こんにちは世界! مرحبا بالعالم! Γεια σου Κόσμε!'))
-# print(identify_language('Hello, world!'))
-res = extract_language_from_warc('/Users/rigvedavangipurapu/Documents/Stanford CS336 assignment 4/cs336-assignment4data/cs336_data/CC-MAIN-20250417135010-20250417165010-00065.warc.gz')
-for key, value in res.items():
-    print("Record ID: ",value[0], "Text: ", key)
-    print("Language: ", value[1][0], "Probability: ", value[1][1])
-    print('--------------------')
\ No newline at end of file
+
+if __name__ == "__main__":
+    import sys
+
+    for text, (record_id, (language, prob)) in extract_language_from_warc(sys.argv[1]).items():
+        print("Record ID: ", record_id, "Text: ", text)
+        print("Language: ", language, "Probability: ", prob)
+        print('--------------------')
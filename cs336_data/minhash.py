@@ -0,0 +1,861 @@
+from __future__ import annotations
+
+import array
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import mmh3
+import numpy as np
+import numpy.typing as npt
+from xopen import xopen
+
+from cs336_data.deduplication import hash_shards
+from cs336_data.parallel import bounded_imap_unordered
+from cs336_data.segments import atomic_open, list_segments, next_segment_prefix, write_segment
+
+logger = logging.getLogger(__name__)
+
+HASH_SEED = 0
+
+# Upper bound on the number of (n-gram, permutation) values materialized at once;
+# small enough that a block stays in cache while it is permuted and reduced.
+MAX_BLOCK_ELEMENTS = 1 << 18
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+COMBINING_MARK_PATTERN = re.compile(r"[\u0300-\u036f]")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before shingling: lowercase, NFD-normalize and strip accents,
+    and remove punctuation. Whitespace is normalized when the text is split into words.
+    """
+    text = unicodedata.normalize("NFD", text.lower())
+    text = COMBINING_MARK_PATTERN.sub("", text)
+    return PUNCTUATION_PATTERN.sub("", text)
+
+
+def _mix64(x: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint64]:
+    """SplitMix64 finalizer, to spread the bits of combined word hashes."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class MinHasher:
+    """
+    MinHash signatures of word n-gram sets, computed with NumPy.
+
+    Every word is hashed once with 64-bit MurmurHash3 and each n-gram hash is
+    a mixed linear combination of its words' hashes, so a document costs one
+    mmh3 call per word regardless of `ngrams`. The `num_hashes` permutations
+    are multiply-add-shift hashes h_i(x) = ((a_i * x + b_i) mod 2**64) >> 32
+    with random odd a_i, a universal family that NumPy evaluates for all n-grams
+    and permutations in one broadcast operation before the column-wise minimum.
+    """
+
+    def __init__(self, num_hashes: int, ngrams: int, seed: int = 0):
+        self.num_hashes = num_hashes
+        self.ngrams = ngrams
+        rng = np.random.default_rng(seed)
+        max_uint64 = np.iinfo(np.uint64).max
+        self.a = rng.integers(1, max_uint64, size=num_hashes, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self.b = rng.integers(0, max_uint64, size=num_hashes, dtype=np.uint64, endpoint=True)
+        self.position_weights = rng.integers(1, max_uint64, size=ngrams, dtype=np.uint64, endpoint=True) | np.uint64(1)
+
+    def ngram_hashes(self, text: str) -> npt.NDArray[np.uint64]:
+        """
+        Hash the distinct word n-grams of a document.
+
+        Documents with fewer than `ngrams` words are treated as a single n-gram.
+
+        Args:
+            text: Raw document text
+
+        Returns:
+            Sorted array of distinct 64-bit n-gram hashes (empty for documents without words)
+        """
+        words = normalize_text(text).split()
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        word_hashes = np.fromiter(
+            (mmh3.hash64(word, HASH_SEED, signed=False)[0] for word in words), dtype=np.uint64, count=len(words)
+        )
+        n = min(self.ngrams, len(words))
+        num_ngrams = len(words) - n + 1
+        combined = np.zeros(num_ngrams, dtype=np.uint64)
+        for offset in range(n):
+            combined += word_hashes[offset : offset + num_ngrams] * self.position_weights[offset]
+        return np.unique(_mix64(combined))
+
+    def _min_hashes(self, hashes: npt.NDArray[np.uint64], offsets: npt.NDArray[np.intp]) -> npt.NDArray[np.uint32]:
+        """Signatures of the n-gram sets hashes[offsets[i]:offsets[i + 1]], all of which must be non-empty."""
+        permuted = hashes[:, None] * self.a
+        permuted += self.b
+        permuted >>= np.uint64(32)
+        return np.minimum.reduceat(permuted, offsets[:-1], axis=0).astype(np.uint32)
+
+    def signatures_from_hashes(self, ngram_hashes: Sequence[npt.NDArray[np.uint64]]) -> npt.NDArray[np.uint32]:
+        """
+        Compute MinHash signatures for a batch of n-gram hash sets.
+
+        N-grams of consecutive documents are concatenated into blocks of at most
+        `MAX_BLOCK_ELEMENTS` permuted values, and each document's minimum is taken
+        with a single `np.minimum.reduceat` over its segment of the block.
+
+        Args:
+            ngram_hashes: One array of n-gram hashes per document
+
+        Returns:
+            (len(ngram_hashes), num_hashes) uint32 matrix; rows of documents
+            without n-grams are all 2**32 - 1
+        """
+        signatures = np.full((len(ngram_hashes), self.num_hashes), np.iinfo(np.uint32).max, dtype=np.uint32)
+        max_block_ngrams = max(1, MAX_BLOCK_ELEMENTS // self.num_hashes)
+        block_docs: list[int] = []
+        block_ngrams = 0
+
+        def flush() -> None:
+            sizes = np.array([len(ngram_hashes[doc]) for doc in block_docs])
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            hashes = np.concatenate([ngram_hashes[doc] for doc in block_docs])
+            signatures[block_docs] = self._min_hashes(hashes, offsets)
+
+        for doc, hashes in enumerate(ngram_hashes):
+            if len(hashes) == 0:
+                continue
+            if len(hashes) > max_block_ngrams:
+                # Very long documents are reduced on their own, block by block.
+                for start in range(0, len(hashes), max_block_ngrams):
+                    block = hashes[start : start + max_block_ngrams]
+                    signatures[doc] = np.minimum(signatures[doc], self._min_hashes(block, np.array([0, len(block)]))[0])
+                continue
+            if block_ngrams + len(hashes) > max_block_ngrams:
+                flush()
+                block_docs, block_ngrams = [], 0
+            block_docs.append(doc)
+            block_ngrams += len(hashes)
+        if block_docs:
+            flush()
+        return signatures
+
+    def signatures(self, texts: Sequence[str]) -> npt.NDArray[np.uint32]:
+        """
+        Compute MinHash signatures for a batch of documents.
+
+        Args:
+            texts: Raw document texts
+
+        Returns:
+            (len(texts), num_hashes) uint32 signature matrix
+        """
+        return self.signatures_from_hashes([self.ngram_hashes(text) for text in texts])
+
+    def signature(self, text: str) -> npt.NDArray[np.uint32]:
+        return self.signatures([text])[0]
+
+
+
+def band_hashes(signatures: npt.NDArray[np.uint32], num_bands: int) -> npt.NDArray[np.uint64]:
+    """
+    Hash each band of every signature to a single 64-bit value.
+
+    Args:
+        signatures: (num_docs, num_hashes) signature matrix
+        num_bands: Number of bands, which must divide num_hashes
+
+    Returns:
+        (num_docs, num_bands) matrix of band hashes
+    """
+    num_docs, num_hashes = signatures.shape
+    if num_hashes % num_bands:
+        raise ValueError(f"num_bands ({num_bands}) must divide num_hashes ({num_hashes})")
+    rows = num_hashes // num_bands
+    weights = np.random.default_rng(HASH_SEED).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    bands = signatures.reshape(num_docs, num_bands, rows).astype(np.uint64)
+    combined = np.zeros((num_docs, num_bands), dtype=np.uint64)
+    for row in range(rows):
+        combined += bands[:, :, row] * weights[row]
+    return _mix64(combined)
+
+
+def jaccard_similarity(a: npt.NDArray[np.uint64], b: npt.NDArray[np.uint64]) -> float:
+    """Exact Jaccard similarity of two arrays of distinct n-gram hashes (0 if both are empty)."""
+    if len(a) == 0 and len(b) == 0:
+        return 0.0
+    intersection = len(np.intersect1d(a, b, assume_unique=True))
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class UnionFind:
+    """
+    Disjoint sets over 0..n-1 stored in a parent array, with path halving and union by size.
+
+    The arrays are `array.array`s rather than numpy arrays: they are as compact,
+    but indexing them one element at a time from Python is much faster. Whole
+    batches of roots are found with numpy through a view of the same memory.
+    """
+
+    def __init__(self, n: int):
+        self.parent = array.array("q", range(n))
+        self.size = array.array("q", [1]) * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int) -> bool:
+        """Merge the sets of x and y, returning False if they already were the same set."""
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return False
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        return True
+
+    def roots_of(self, xs: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """Root of the set of every element of `xs`, found for all of them at once."""
+        parent = np.frombuffer(self.parent, dtype=np.int64)
+        roots = parent[xs]
+        while not np.array_equal(grandparents := parent[roots], roots):
+            roots = grandparents
+        return roots
+
+    def roots(self) -> npt.NDArray[np.int64]:
+        """Root of every element's set."""
+        return self.roots_of(np.arange(len(self.parent)))
+
+
+class SignatureStore:
+    """(num_docs, num_hashes) uint32 signature matrix kept in a memory-mapped .npy file."""
+
+    def __init__(self, signatures: np.memmap):
+        self.signatures = signatures
+
+    @classmethod
+    def create(cls, path: str | os.PathLike, num_docs: int, num_hashes: int) -> SignatureStore:
+        return cls(np.lib.format.open_memmap(path, mode="w+", dtype=np.uint32, shape=(num_docs, num_hashes)))
+
+    @classmethod
+    def open(cls, path: str | os.PathLike, mode: str = "r") -> SignatureStore:
+        return cls(np.load(path, mmap_mode=mode))
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def flush(self) -> None:
+        self.signatures.flush()
+
+
+# Spilled LSH bucket record: the (band, band hash) bucket key and the document in it.
+BUCKET_RECORD_DTYPE = np.dtype([("key", "<u8"), ("doc", "<u4")])
+# Peak bytes per record while `_cluster_buckets` verifies a partition: the records and their sorted
+# copy, then at most one packed pair per record, deduplicated with its inverse index and unpacked.
+BUCKET_SORT_BYTES_PER_RECORD = 72
+
+
+def bucket_keys(doc_band_hashes: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint64]:
+    """Combine each band hash with its band index into a single 64-bit bucket key."""
+    bands = np.arange(doc_band_hashes.shape[1], dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return _mix64(doc_band_hashes + bands)
+
+
+def _cluster_buckets(
+    records: npt.NDArray,
+    similarities: Callable[[npt.NDArray[np.int64]], npt.NDArray[np.float64]],
+    jaccard_threshold: float,
+    clusters: UnionFind,
+    max_pairs: int,
+) -> tuple[int, int]:
+    """
+    Verify the documents sharing a bucket and union the duplicates, in rounds of star pairs.
+
+    Each round pairs the first remaining document of every bucket with each of
+    the others. Members that end up in the first document's cluster are done;
+    the rest stay for the next round, where a new first document is picked
+    among them. A bucket of k near-duplicates thus costs k - 1 pairs instead of
+    all k(k - 1)/2, and a first document that matches nothing (say, a short
+    page that happens to share a band) no longer hides the duplicates among
+    the others. Unlike all pairs, a remaining member is not compared with the
+    members already clustered in an earlier round, so it is only missed if it
+    is similar to one of those but to none of the first documents.
+
+    Args:
+        records: Bucket records, see `BUCKET_RECORD_DTYPE`
+        similarities: Similarity of each (first, second) row of a pair array
+        jaccard_threshold: Minimum similarity for a pair to be a duplicate
+        clusters: Union-find over the documents, updated in place
+        max_pairs: Maximum number of pairs verified at once
+
+    Returns:
+        (num_candidate_pairs, num_duplicate_pairs): distinct pairs per round, and those verified as duplicates
+    """
+    records = records[np.argsort(records["key"], kind="stable")]
+    num_candidate_pairs = num_duplicate_pairs = 0
+    while True:
+        is_first = np.ones(len(records), dtype=bool)
+        is_first[1:] = records["key"][1:] != records["key"][:-1]
+        bucket_sizes = np.diff(np.append(np.flatnonzero(is_first), len(records)))
+        # Documents alone in their bucket have nothing left to be compared with.
+        shared = np.repeat(bucket_sizes > 1, bucket_sizes)
+        if not shared.any():
+            break
+        records, is_first, bucket_sizes = records[shared], is_first[shared], bucket_sizes[bucket_sizes > 1]
+        firsts = np.repeat(records["doc"][is_first], bucket_sizes - 1)
+        seconds = records["doc"][~is_first]
+        # Pack each pair into one int64, so that pairs from several buckets are verified once.
+        packed = np.minimum(firsts, seconds).astype(np.int64)
+        packed <<= 32
+        packed |= np.maximum(firsts, seconds)
+        del firsts, seconds
+        packed, pair_of_member = np.unique(packed, return_inverse=True)
+        pairs = np.empty((len(packed), 2), dtype=np.int64)
+        np.right_shift(packed, 32, out=pairs[:, 0])
+        np.bitwise_and(packed, 0xFFFFFFFF, out=pairs[:, 1])
+        del packed
+        # A document with two bands in one bucket is paired with itself.
+        num_candidate_pairs += int((pairs[:, 0] != pairs[:, 1]).sum())
+        for start in range(0, len(pairs), max_pairs):
+            chunk = pairs[start : start + max_pairs]
+            # Pairs already clustered through other pairs are not verified again.
+            pending = clusters.roots_of(chunk[:, 0]) != clusters.roots_of(chunk[:, 1])
+            duplicates = np.zeros(len(chunk), dtype=bool)
+            duplicates[pending] = similarities(chunk[pending]) >= jaccard_threshold
+            for first, second in chunk[duplicates].tolist():
+                clusters.union(first, second)
+            num_duplicate_pairs += int(duplicates.sum())
+        clustered = np.concatenate(
+            [np.empty(0, dtype=bool)]
+            + [
+                clusters.roots_of(chunk[:, 0]) == clusters.roots_of(chunk[:, 1])
+                for chunk in np.split(pairs, range(max_pairs, len(pairs), max_pairs))
+            ]
+        )
+        records = records[~is_first][~clustered[pair_of_member]]
+    return num_candidate_pairs, num_duplicate_pairs
+
+
+class MinHashIndex:
+    """
+    LSH buckets and signatures persisted across runs as a directory of segments.
+
+    Every deduplication run against the index appends one segment with the
+    bucket keys of its documents (sorted, next to the document ids), their
+    signatures, their n-gram hashes and their paths. The n-gram hashes (8
+    bytes per distinct n-gram) let later runs verify pairs by exact Jaccard
+    similarity after the original files are gone. Documents are numbered
+    across segments in insertion order. Lookups binary-search the
+    memory-mapped keys of each segment, so a run costs time in the size of
+    its own data rather than of the whole history. The MinHash parameters are
+    fixed when the index is created, since signatures and buckets are only
+    comparable between runs that share them.
+    """
+
+    def __init__(self, directory: str | os.PathLike, num_hashes: int, num_bands: int, ngrams: int, seed: int = 0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.num_hashes = num_hashes
+        params = {"num_hashes": num_hashes, "num_bands": num_bands, "ngrams": ngrams, "seed": seed}
+        params_path = self.directory / "index.json"
+        if params_path.exists():
+            stored = json.loads(params_path.read_text())
+            if stored != params:
+                raise ValueError(f"MinHash index at {self.directory} was built with {stored}, not {params}")
+        else:
+            params_path.write_text(json.dumps(params))
+        self.segments = list_segments(self.directory)
+        self.offsets = [0]
+        for prefix in self.segments:
+            self.offsets.append(self.offsets[-1] + len(np.load(f"{prefix}.signatures.npy", mmap_mode="r")))
+        self._paths: dict[int, list[str]] = {}
+        self._ngram_offsets: dict[int, npt.NDArray[np.uint64]] = {}
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    def matches(self, keys: npt.NDArray[np.uint64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        Find the indexed documents in the same bucket as each of `keys`.
+
+        Returns:
+            (positions, doc_ids): `keys[positions[i]]` is a bucket key of indexed document `doc_ids[i]`
+        """
+        positions, doc_ids = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for prefix, offset in zip(self.segments, self.offsets):
+            segment_keys = np.load(f"{prefix}.keys.npy", mmap_mode="r")
+            lo = np.searchsorted(segment_keys, keys, side="left")
+            sizes = np.searchsorted(segment_keys, keys, side="right") - lo
+            # Expand every [lo, lo + size) range into the record indices it covers.
+            records = np.repeat(lo - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+            positions.append(np.repeat(np.arange(len(keys)), sizes))
+            doc_ids.append(offset + np.load(f"{prefix}.docs.npy", mmap_mode="r")[records].astype(np.int64))
+        return np.concatenate(positions), np.concatenate(doc_ids)
+
+    def signatures_of(self, doc_ids: npt.NDArray[np.int64]) -> npt.NDArray[np.uint32]:
+        """Read the signatures of indexed documents, one row per id."""
+        segments = np.searchsorted(self.offsets, doc_ids, side="right") - 1
+        result = np.empty((len(doc_ids), self.num_hashes), dtype=np.uint32)
+        for segment in np.unique(segments).tolist():
+            signatures = np.load(f"{self.segments[segment]}.signatures.npy", mmap_mode="r")
+            mask = segments == segment
+            result[mask] = signatures[doc_ids[mask] - self.offsets[segment]]
+        return result
+
+    def path_of(self, doc_id: int) -> Path:
+        """Original path of an indexed document."""
+        segment = int(np.searchsorted(self.offsets, doc_id, side="right")) - 1
+        if segment not in self._paths:
+            self._paths[segment] = json.loads(Path(f"{self.segments[segment]}.paths.json").read_text())
+        return Path(self._paths[segment][doc_id - self.offsets[segment]])
+
+    def ngram_hashes_of(self, doc_id: int) -> npt.NDArray[np.uint64]:
+        """Read the n-gram hashes of an indexed document, as stored when it was added."""
+        segment = int(np.searchsorted(self.offsets, doc_id, side="right")) - 1
+        prefix = self.segments[segment]
+        if segment not in self._ngram_offsets:
+            if not os.path.exists(f"{prefix}.ngram_offsets.npy"):
+                raise FileNotFoundError(
+                    f"Segment {prefix} stores no n-gram hashes, so its documents can only be verified with "
+                    "verify='signature'"
+                )
+            self._ngram_offsets[segment] = np.load(f"{prefix}.ngram_offsets.npy")
+        row = doc_id - self.offsets[segment]
+        start, end = self._ngram_offsets[segment][row : row + 2].tolist()
+        return np.fromfile(f"{prefix}.ngrams.bin", dtype=np.uint64, count=end - start, offset=start * 8)
+
+    def add_segment(
+        self,
+        keys: npt.NDArray[np.uint64],
+        doc_ids: npt.NDArray[np.int64],
+        signatures: npt.NDArray[np.uint32],
+        paths: Sequence[str | os.PathLike],
+        ngram_hashes: Iterable[npt.NDArray[np.uint64]],
+    ) -> None:
+        """
+        Persist the documents of one run as a new segment.
+
+        Args:
+            keys: Bucket keys of the run's documents, see `bucket_keys`
+            doc_ids: Document (row of `signatures`) of each key
+            signatures: Signatures of all documents of the run
+            paths: Paths of all documents of the run
+            ngram_hashes: N-gram hashes of all documents of the run, in order
+        """
+        prefix = next_segment_prefix(self.directory, self.segments)
+        order = np.argsort(keys, kind="stable")
+        with atomic_open(f"{prefix}.paths.json") as f:
+            f.write(json.dumps([os.path.abspath(path) for path in paths]).encode())
+        # The n-gram hashes of all documents are concatenated, document i spanning [offsets[i], offsets[i + 1]).
+        ngram_offsets = [0]
+        with atomic_open(f"{prefix}.ngrams.bin") as f:
+            for doc_ngram_hashes in ngram_hashes:
+                doc_ngram_hashes.astype(np.uint64, copy=False).tofile(f)
+                ngram_offsets.append(ngram_offsets[-1] + len(doc_ngram_hashes))
+        write_segment(
+            prefix,
+            keys[order],
+            {
+                "ngram_offsets": np.array(ngram_offsets, dtype=np.uint64),
+                "signatures": signatures,
+                "docs": doc_ids[order].astype(np.uint32),
+            },
+        )
+        self.segments.append(prefix)
+        self.offsets.append(self.offsets[-1] + len(signatures))
+
+
+@dataclass
+class MinHashDedupStats:
+    """Summary of a MinHash deduplication run, for tuning bands and rows."""
+
+    num_documents: int = 0
+    num_candidate_pairs: int = 0
+    num_duplicate_pairs: int = 0
+    num_kept_documents: int = 0
+    signature_seconds: float = 0.0
+    verification_seconds: float = 0.0
+
+
+def _sign_files(args: tuple[MinHasher, list[Path], Path, int]) -> tuple[int, npt.NDArray[np.bool_]]:
+    """Write the signatures of a batch of files to the store rows starting at `start`."""
+    minhasher, paths, signatures_path, start = args
+    ngram_hashes = []
+    for path in paths:
+        with xopen(path) as f:
+            ngram_hashes.append(minhasher.ngram_hashes(f.read()))
+    store = SignatureStore.open(signatures_path, mode="r+")
+    store.signatures[start : start + len(paths)] = minhasher.signatures_from_hashes(ngram_hashes)
+    store.flush()
+    return start, np.array([len(hashes) > 0 for hashes in ngram_hashes], dtype=bool)
+
+
+def compute_signatures(
+    input_files: Sequence[str | os.PathLike],
+    minhasher: MinHasher,
+    signatures_path: str | os.PathLike,
+    num_workers: int = 1,
+    batch_docs: int = 4096,
+) -> npt.NDArray[np.bool_]:
+    """
+    Write the MinHash signatures of many documents to a new `SignatureStore`.
+
+    With `num_workers > 1`, batches of documents are signed in a process pool.
+    Every worker reads its own files and writes its rows straight into the
+    memory-mapped store, so only the batch bounds and a small mask travel
+    between processes.
+
+    Args:
+        input_files: Paths of the documents to sign
+        minhasher: Hash family for the signatures
+        signatures_path: Path of the .npy signature store to create
+        num_workers: Number of worker processes; 1 signs everything in this process
+        batch_docs: Maximum number of documents signed per task
+
+    Returns:
+        Boolean mask of the documents that have at least one n-gram
+    """
+    input_files = [Path(path) for path in input_files]
+    num_docs = len(input_files)
+    SignatureStore.create(signatures_path, num_docs, minhasher.num_hashes).flush()
+    # Keep a few tasks per worker so that uneven document lengths still balance.
+    batch_docs = max(1, min(batch_docs, math.ceil(num_docs / (4 * num_workers))))
+    batches = [
+        (minhasher, input_files[start : start + batch_docs], Path(signatures_path), start)
+        for start in range(0, num_docs, batch_docs)
+    ]
+    has_ngrams = np.zeros(num_docs, dtype=bool)
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for start, mask in bounded_imap_unordered(executor, _sign_files, batches, 2 * num_workers):
+                has_ngrams[start : start + len(mask)] = mask
+    else:
+        for start, mask in map(_sign_files, batches):
+            has_ngrams[start : start + len(mask)] = mask
+    return has_ngrams
+
+
+def _ngram_hash_loader(
+    path_of: Callable[[int], Path], minhasher: MinHasher, maxsize: int
+) -> Callable[[int], npt.NDArray[np.uint64]]:
+    """Load the n-gram hashes of documents by id, re-reading them from disk on a cache miss."""
+
+    @lru_cache(maxsize=maxsize)
+    def load(doc_id: int) -> npt.NDArray[np.uint64]:
+        with xopen(path_of(doc_id)) as f:
+            return minhasher.ngram_hashes(f.read())
+
+    return load
+
+
+def _load_signatures(
+    input_files: list[Path], minhasher: MinHasher, num_workers: int
+) -> tuple[npt.NDArray[np.uint32], npt.NDArray[np.bool_], Callable[[int], npt.NDArray[np.uint64]]]:
+    """Compute the signatures of all documents in memory, with a mask of the non-empty ones and their n-grams."""
+    if num_workers > 1:
+        with tempfile.TemporaryDirectory(prefix="minhash_") as tmp:
+            signatures_path = Path(tmp) / "signatures.npy"
+            has_ngrams = compute_signatures(input_files, minhasher, signatures_path, num_workers)
+            signatures = np.load(signatures_path)
+        return signatures, has_ngrams, _ngram_hash_loader(input_files.__getitem__, minhasher, maxsize=4096)
+    ngram_hashes = []
+    for path in input_files:
+        with xopen(path) as f:
+            ngram_hashes.append(minhasher.ngram_hashes(f.read()))
+    has_ngrams = np.array([len(hashes) > 0 for hashes in ngram_hashes], dtype=bool)
+    return minhasher.signatures_from_hashes(ngram_hashes), has_ngrams, ngram_hashes.__getitem__
+
+
+def _bucket_records(
+    signatures: npt.NDArray[np.uint32], has_ngrams: npt.NDArray[np.bool_], num_bands: int, first_doc: int = 0
+) -> npt.NDArray:
+    """Bucket records of the documents with n-grams among `signatures`, numbered from `first_doc`."""
+    keys = bucket_keys(band_hashes(signatures[has_ngrams], num_bands))
+    records = np.empty(keys.size, dtype=BUCKET_RECORD_DTYPE)
+    records["key"] = keys.ravel()
+    records["doc"] = np.repeat(first_doc + np.flatnonzero(has_ngrams), num_bands)
+    return records
+
+
+def _pair_similarities(
+    signatures: npt.NDArray[np.uint32], doc_ngram_hashes: Callable[[int], npt.NDArray[np.uint64]], verify: str
+) -> Callable[[npt.NDArray[np.int64]], npt.NDArray[np.float64]]:
+    """The similarity of each (first, second) row of a pair array, as chosen by `verify`."""
+
+    def similarities(pairs: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+        if verify == "signature":
+            return (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        return np.array(
+            [jaccard_similarity(doc_ngram_hashes(first), doc_ngram_hashes(second)) for first, second in pairs.tolist()]
+        )
+
+    return similarities
+
+
+def _in_memory_clusters(
+    input_files: list[Path],
+    minhasher: MinHasher,
+    num_bands: int,
+    jaccard_threshold: float,
+    verify: str,
+    num_workers: int,
+    stats: MinHashDedupStats,
+) -> UnionFind:
+    start = time.perf_counter()
+    signatures, has_ngrams, doc_ngram_hashes = _load_signatures(input_files, minhasher, num_workers)
+    records = _bucket_records(signatures, has_ngrams, num_bands)
+    stats.signature_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusters = UnionFind(len(input_files))
+    stats.num_candidate_pairs, stats.num_duplicate_pairs = _cluster_buckets(
+        records, _pair_similarities(signatures, doc_ngram_hashes, verify), jaccard_threshold, clusters, max_pairs=4096
+    )
+    stats.verification_seconds = time.perf_counter() - start
+    return clusters
+
+
+def _out_of_core_clusters(
+    input_files: list[Path],
+    minhasher: MinHasher,
+    num_bands: int,
+    jaccard_threshold: float,
+    verify: str,
+    num_workers: int,
+    work_directory: Path,
+    memory_budget_bytes: int,
+    batch_docs: int,
+    stats: MinHashDedupStats,
+) -> UnionFind:
+    start = time.perf_counter()
+    work_directory.mkdir(parents=True, exist_ok=True)
+    num_docs = len(input_files)
+    num_partitions = max(1, math.ceil(num_docs * num_bands * BUCKET_SORT_BYTES_PER_RECORD / memory_budget_bytes))
+    has_ngrams = compute_signatures(input_files, minhasher, work_directory / "signatures.npy", num_workers, batch_docs)
+    store = SignatureStore.open(work_directory / "signatures.npy")
+
+    # Stream the store in batches and distribute bucket records by key prefix
+    # over partition files that can each be sorted within the memory budget.
+    partition_paths = [work_directory / f"buckets{partition:05d}.bin" for partition in range(num_partitions)]
+    partition_files = [open(path, "wb") for path in partition_paths]
+    try:
+        for batch_start in range(0, num_docs, batch_docs):
+            batch_signatures = np.asarray(store.signatures[batch_start : batch_start + batch_docs])
+            batch_has_ngrams = has_ngrams[batch_start : batch_start + batch_docs]
+            records = _bucket_records(batch_signatures, batch_has_ngrams, num_bands, batch_start)
+            partitions = hash_shards(records["key"], num_partitions)
+            order = np.argsort(partitions, kind="stable")
+            bounds = np.searchsorted(partitions[order], np.arange(num_partitions + 1))
+            for partition, partition_file in enumerate(partition_files):
+                records[order[bounds[partition] : bounds[partition + 1]]].tofile(partition_file)
+    finally:
+        for partition_file in partition_files:
+            partition_file.close()
+
+    stats.signature_seconds = time.perf_counter() - start
+
+    # Verify and union the buckets of one partition at a time, so that only
+    # that partition's records and pairs are ever in memory.
+    start = time.perf_counter()
+    clusters = UnionFind(num_docs)
+    doc_ngram_hashes = _ngram_hash_loader(input_files.__getitem__, minhasher, maxsize=batch_docs)
+    similarities = _pair_similarities(store.signatures, doc_ngram_hashes, verify)
+    for path in partition_paths:
+        num_candidate_pairs, num_duplicate_pairs = _cluster_buckets(
+            np.fromfile(path, dtype=BUCKET_RECORD_DTYPE),
+            similarities,
+            jaccard_threshold,
+            clusters,
+            max_pairs=max(1, batch_docs // 2),
+        )
+        path.unlink()
+        stats.num_candidate_pairs += num_candidate_pairs
+        stats.num_duplicate_pairs += num_duplicate_pairs
+    stats.verification_seconds = time.perf_counter() - start
+    return clusters
+
+
+def _incremental_clusters(
+    input_files: list[Path],
+    minhasher: MinHasher,
+    num_bands: int,
+    jaccard_threshold: float,
+    verify: str,
+    num_workers: int,
+    index: MinHashIndex,
+    stats: MinHashDedupStats,
+) -> UnionFind:
+    """Cluster the documents with each other and with the index; node `len(input_files)` stands for the index."""
+    start = time.perf_counter()
+    num_docs = len(input_files)
+    signatures, has_ngrams, doc_ngram_hashes = _load_signatures(input_files, minhasher, num_workers)
+    records = _bucket_records(signatures, has_ngrams, num_bands)
+    keys, doc_ids = records["key"], records["doc"].astype(np.int64)
+    positions, indexed_doc_ids = index.matches(keys)
+    # (new document, indexed document) pairs
+    indexed_pairs = np.unique(np.stack([doc_ids[positions], indexed_doc_ids], axis=1), axis=0)
+    stats.signature_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusters = UnionFind(num_docs + 1)
+    stats.num_candidate_pairs, stats.num_duplicate_pairs = _cluster_buckets(
+        records, _pair_similarities(signatures, doc_ngram_hashes, verify), jaccard_threshold, clusters, max_pairs=4096
+    )
+    if verify == "jaccard":
+        indexed_similarities = np.array(
+            [
+                jaccard_similarity(doc_ngram_hashes(first), index.ngram_hashes_of(second))
+                for first, second in indexed_pairs.tolist()
+            ]
+        )
+    else:
+        indexed_signatures = index.signatures_of(indexed_pairs[:, 1])
+        indexed_similarities = (signatures[indexed_pairs[:, 0]] == indexed_signatures).mean(axis=1)
+    for first in indexed_pairs[indexed_similarities >= jaccard_threshold, 0].tolist():
+        clusters.union(first, num_docs)
+    stats.num_candidate_pairs += len(indexed_pairs)
+    stats.num_duplicate_pairs += int((indexed_similarities >= jaccard_threshold).sum())
+    stats.verification_seconds = time.perf_counter() - start
+
+    index.add_segment(keys, doc_ids, signatures, input_files, map(doc_ngram_hashes, range(num_docs)))
+    return clusters
+
+
+def minhash_deduplication(
+    input_files: Iterable[str | os.PathLike],
+    num_hashes: int,
+    num_bands: int,
+    ngrams: int,
+    jaccard_threshold: float,
+    output_directory: str | os.PathLike,
+    verify: str = "jaccard",
+    seed: int = 0,
+    work_directory: str | os.PathLike | None = None,
+    memory_budget_bytes: int = 1 << 30,
+    batch_docs: int = 4096,
+    num_workers: int = 1,
+    index_directory: str | os.PathLike | None = None,
+) -> MinHashDedupStats:
+    """
+    Remove fuzzy duplicate documents with MinHash and LSH.
+
+    Documents sharing a band bucket are candidates. A candidate pair counts as
+    a duplicate if its similarity is at least `jaccard_threshold`. Duplicates
+    are clustered with union-find, and one representative per cluster (the one
+    that comes first in `input_files`) is copied to `output_directory` under its
+    original name.
+
+    By default signatures and buckets are kept in memory. With a
+    `work_directory`, the pipeline runs out of core: documents are streamed in
+    batches of `batch_docs`, signatures are written to a memory-mapped
+    `signatures.npy` store there, and (bucket key, doc id) records are spilled
+    to partition files sized so that each can be sorted within
+    `memory_budget_bytes`. Each partition is then sorted on its own and its
+    buckets are verified and unioned in rounds of star pairs (see
+    `_cluster_buckets`) before the next partition is read. Pairs found in
+    several partitions are counted once per partition and skipped once
+    already clustered, so the pair counts are not comparable to those of an
+    in-memory run.
+
+    With `num_workers > 1`, signatures are computed by a process pool whose
+    workers write directly into the memory-mapped store (see
+    `compute_signatures`).
+
+    With an `index_directory`, documents are also compared against all
+    documents added to that `MinHashIndex` by earlier runs, and are dropped if
+    they duplicate any of them; afterwards they are added to the index. The
+    new documents themselves are processed in memory, so this cannot be
+    combined with `work_directory`. The index stores the n-gram hashes of
+    its documents, so Jaccard verification never re-reads indexed documents,
+    which may have been moved or deleted since.
+
+    Args:
+        input_files: Paths of the documents to deduplicate
+        num_hashes: Length of the MinHash signatures
+        num_bands: Number of LSH bands, which must divide num_hashes
+        ngrams: Word n-gram length used for shingling
+        jaccard_threshold: Minimum similarity for a candidate pair to be a duplicate
+        output_directory: Directory to write the kept documents to
+        verify: "jaccard" to verify candidates with the exact n-gram Jaccard
+            similarity, or "signature" to use the fraction of agreeing signature entries
+        seed: Seed for the MinHash permutations
+        work_directory: If given, run out of core and keep the signature store here
+        memory_budget_bytes: Memory budget for sorting bucket records out of core
+        batch_docs: Number of documents processed per batch out of core
+        num_workers: Number of processes computing signatures
+        index_directory: Directory of a `MinHashIndex` persisting buckets across runs
+
+    Returns:
+        Candidate and duplicate pair counts and timings
+    """
+    if verify not in ("jaccard", "signature"):
+        raise ValueError(f"Unknown verification {verify!r}, expected 'jaccard' or 'signature'")
+    if index_directory is not None and work_directory is not None:
+        raise ValueError("index_directory cannot be combined with the out-of-core work_directory")
+    input_files = [Path(path) for path in input_files]
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    stats = MinHashDedupStats(num_documents=len(input_files))
+
+    minhasher = MinHasher(num_hashes, ngrams, seed=seed)
+    if index_directory is not None:
+        index = MinHashIndex(index_directory, num_hashes, num_bands, ngrams, seed)
+        clusters = _incremental_clusters(
+            input_files, minhasher, num_bands, jaccard_threshold, verify, num_workers, index, stats
+        )
+    elif work_directory is None:
+        clusters = _in_memory_clusters(
+            input_files, minhasher, num_bands, jaccard_threshold, verify, num_workers, stats
+        )
+    else:
+        clusters = _out_of_core_clusters(
+            input_files,
+            minhasher,
+            num_bands,
+            jaccard_threshold,
+            verify,
+            num_workers,
+            Path(work_directory),
+            memory_budget_bytes,
+            batch_docs,
+            stats,
+        )
+
+    # The first document of each cluster in input order is its representative,
+    # unless the cluster already has one in the index.
+    roots = clusters.roots()
+    seen_roots = {int(roots[-1])} if len(roots) > len(input_files) else set()
+    for doc_id, root in enumerate(roots[: len(input_files)].tolist()):
+        if root not in seen_roots:
+            seen_roots.add(root)
+            shutil.copyfile(input_files[doc_id], output_directory / input_files[doc_id].name)
+            stats.num_kept_documents += 1
+
+    logger.info(
+        "Kept %d of %d documents: %d candidate pairs, %d duplicates (signatures %.2fs, verification %.2fs)",
+        stats.num_kept_documents,
+        stats.num_documents,
+        stats.num_candidate_pairs,
+        stats.num_duplicate_pairs,
+        stats.signature_seconds,
+        stats.verification_seconds,
+    )
+    return stats
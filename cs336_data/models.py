@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+import fasttext
+import numpy as np
+import numpy.typing as npt
+
+# Directory populated by `get_assets.sh`; override with the CS336_DATA_ASSETS environment variable.
+ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+ASSETS_DIR_ENV_VAR = "CS336_DATA_ASSETS"
+
+MODEL_FILES: dict[str, str] = {
+    "language_identification": "lid.176.bin",
+    "hatespeech": "dolma_fasttext_hatespeech_jigsaw_model.bin",
+    "nsfw": "dolma_fasttext_nsfw_jigsaw_model.bin",
+    # Trained locally with `python -m cs336_data.quality_classifier`.
+    "quality": "quality_classifier.bin",
+}
+
+LABEL_PREFIX = "__label__"
+
+_models: dict[str, fasttext.FastText._FastText] = {}
+_lock = threading.Lock()
+
+
+def register_model(name: str, filename: str) -> None:
+    """Make a fastText model file in the assets directory available under `name`."""
+    MODEL_FILES[name] = filename
+
+
+def assets_dir() -> Path:
+    return Path(os.environ.get(ASSETS_DIR_ENV_VAR, ASSETS_DIR))
+
+
+def model_path(name: str) -> Path:
+    """
+    Resolve the on-disk location of a registered model.
+
+    Args:
+        name: Registered model name, e.g. "language_identification"
+
+    Returns:
+        Path to the model binary inside the assets directory
+    """
+    if name not in MODEL_FILES:
+        raise KeyError(f"Unknown model {name!r}, expected one of {sorted(MODEL_FILES)}")
+    path = assets_dir() / MODEL_FILES[name]
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Model {name!r} not found at {path}. Run get_assets.sh or set {ASSETS_DIR_ENV_VAR} "
+            "to the directory containing the model files."
+        )
+    return path
+
+
+def get_model(name: str) -> fasttext.FastText._FastText:
+    """
+    Return the fastText model registered under `name`, loading it on first use.
+
+    Models are loaded at most once per process. Worker processes forked after
+    `preload_models` inherit the parent's already-loaded models and share their
+    pages copy-on-write instead of reading them from disk again.
+    """
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = fasttext.load_model(str(model_path(name)))
+    return model
+
+
+def preload_models(*names: str) -> None:
+    """
+    Load models in the current process, e.g. in the parent before creating a pool.
+
+    Only pools that start workers with the "fork" start method
+    (`multiprocessing.get_context("fork")`) share the preloaded models; workers
+    started with "spawn" or "forkserver" load them again lazily on first use.
+
+    Args:
+        names: Registered model names; all registered models if none are given
+    """
+    for name in names or tuple(MODEL_FILES):
+        get_model(name)
+
+
+def predict_batch(
+    model_names: Sequence[str], texts: Sequence[str], batch_size: int = 1024
+) -> tuple[npt.NDArray[np.str_], npt.NDArray[np.float32]]:
+    """
+    Run binary-style fastText classifiers over many documents, keeping the top label of each.
+
+    fastText rejects newlines, so every document is normalized once and then
+    sent to all models in chunks of `batch_size`, one call per model and chunk.
+
+    Args:
+        model_names: Registered model names
+        texts: Documents to classify
+        batch_size: Number of documents per fastText call
+
+    Returns:
+        (labels, scores) arrays of shape (len(texts), len(model_names)), without the label prefix
+    """
+    models = [get_model(name) for name in model_names]
+    labels = np.empty((len(texts), len(models)), dtype=object)
+    scores = np.empty((len(texts), len(models)), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        chunk = [text.replace("\n", " ") for text in texts[start : start + batch_size]]
+        end = start + len(chunk)
+        for column, model in enumerate(models):
+            chunk_labels, chunk_scores = model.predict(chunk, k=1)
+            labels[start:end, column] = [doc_labels[0][len(LABEL_PREFIX) :] for doc_labels in chunk_labels]
+            scores[start:end, column] = np.asarray(chunk_scores, dtype=np.float32).reshape(len(chunk))
+    return labels.astype(np.str_), scores
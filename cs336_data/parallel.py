@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_imap_unordered(
+    executor: Executor,
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    max_in_flight: int,
+) -> Iterator[R]:
+    """
+    Map `fn` over `items` on `executor`, yielding results in completion order.
+
+    Unlike `Executor.map`, at most `max_in_flight` tasks are submitted at any
+    time, so a long (or lazily produced) list of inputs never turns into an
+    unbounded backlog of pending futures and results.
+
+    Args:
+        executor: Thread or process pool to run tasks on
+        fn: Function to apply to each item (must be picklable for process pools)
+        items: Inputs, consumed lazily
+        max_in_flight: Maximum number of submitted but unconsumed tasks
+
+    Returns:
+        Iterator over the results of `fn`
+    """
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be positive, got {max_in_flight}")
+
+    items = iter(items)
+    pending: set[Future[R]] = set()
+    try:
+        for item in items:
+            pending.add(executor.submit(fn, item))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
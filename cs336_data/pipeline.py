@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from xopen import xopen
+
+from cs336_data.extract_text import extract_text_from_warc
+from cs336_data.gopher_filters import DEFAULT_THRESHOLDS, GopherThresholds, gopher_quality_filter
+from cs336_data.harmful_content import HARMFUL_MODELS, classify_harmful_batch
+from cs336_data.language_identification import identify_language_batch
+from cs336_data.mask_emails import PII_PATTERNS, mask_pii
+from cs336_data.models import preload_models
+from cs336_data.parallel import bounded_imap_unordered
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Document:
+    """A document flowing through the pipeline, with annotations added by its stages."""
+
+    record_id: str
+    url: str
+    text: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps({"id": self.record_id, "url": self.url, "text": self.text, **self.metadata})
+
+
+class Stage:
+    """
+    One step of a `Pipeline`.
+
+    Subclasses implement `process`, which annotates or rewrites a document and
+    returns it, or returns None to reject it. Stages backed by a model can
+    instead override `process_batch` and set `batch_size` to see several
+    documents per call.
+    """
+
+    name = "stage"
+    batch_size = 1
+    # Registered models (see `cs336_data.models`) the stage uses.
+    models: tuple[str, ...] = ()
+
+    def process(self, document: Document) -> Document | None:
+        raise NotImplementedError
+
+    def process_batch(self, documents: list[Document]) -> list[Document | None]:
+        return [self.process(document) for document in documents]
+
+
+class LengthFilter(Stage):
+    """Reject documents shorter than `min_chars` characters once leading and trailing whitespace is stripped."""
+
+    name = "length"
+
+    def __init__(self, min_chars: int = 1):
+        self.min_chars = min_chars
+
+    def process(self, document: Document) -> Document | None:
+        return document if len(document.text.strip()) >= self.min_chars else None
+
+
+class LanguageFilter(Stage):
+    """Keep documents whose most likely language is one of `languages` with at least `min_score`."""
+
+    name = "language"
+    batch_size = 256
+    models = ("language_identification",)
+
+    def __init__(self, languages: Iterable[str] = ("en",), min_score: float = 0.5):
+        self.languages = frozenset(languages)
+        self.min_score = min_score
+
+    def process_batch(self, documents: list[Document]) -> list[Document | None]:
+        labels, scores = identify_language_batch([document.text for document in documents])
+        results = []
+        for document, label, score in zip(documents, labels[:, 0].tolist(), scores[:, 0].tolist()):
+            document.metadata["language"] = label
+            document.metadata["language_score"] = score
+            results.append(document if label in self.languages and score >= self.min_score else None)
+        return results
+
+
+class HarmfulContentFilter(Stage):
+    """Reject documents classified as hate speech or NSFW with at least `threshold` confidence."""
+
+    name = "harmful"
+    batch_size = 256
+    models = HARMFUL_MODELS
+
+    # Label of the harmful class of each model in HARMFUL_MODELS.
+    HARMFUL_LABELS = ("toxic", "nsfw")
+
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+
+    def process_batch(self, documents: list[Document]) -> list[Document | None]:
+        labels, scores = classify_harmful_batch([document.text for document in documents])
+        harmful = ((labels == np.array(self.HARMFUL_LABELS)) & (scores >= self.threshold)).any(axis=1)
+        results = []
+        for document, document_labels, is_harmful in zip(documents, labels.tolist(), harmful.tolist()):
+            document.metadata.update(zip(self.models, document_labels))
+            results.append(None if is_harmful else document)
+        return results
+
+
+class GopherFilter(Stage):
+    """Reject documents failing the Gopher quality rules."""
+
+    name = "gopher"
+
+    def __init__(self, tokenizer: str = "nltk", thresholds: GopherThresholds = DEFAULT_THRESHOLDS):
+        self.tokenizer = tokenizer
+        self.thresholds = thresholds
+
+    def process(self, document: Document) -> Document | None:
+        return document if gopher_quality_filter(document.text, self.tokenizer, self.thresholds) else None
+
+
+class PIIMasker(Stage):
+    """Mask personal information in place, recording the number of replacements of each kind."""
+
+    name = "pii"
+
+    def __init__(self, kinds: Iterable[str] = tuple(PII_PATTERNS)):
+        self.kinds = tuple(kinds)
+
+    def process(self, document: Document) -> Document | None:
+        document.text, counts = mask_pii(document.text, self.kinds)
+        document.metadata["pii"] = counts
+        return document
+
+
+STAGES: dict[str, type[Stage]] = {
+    stage.name: stage for stage in (LengthFilter, LanguageFilter, HarmfulContentFilter, GopherFilter, PIIMasker)
+}
+
+
+def default_stages() -> list[Stage]:
+    """
+    The standard filtering stages, cheapest first.
+
+    The length check and a single language model run first, so later stages
+    only see documents in the wanted languages. The two batched fastText
+    harmful content models come next, since they are cheaper per byte than the
+    Gopher rules with NLTK tokenization, which run on what is left. PII
+    masking runs last so that only kept documents are rewritten.
+    """
+    return [stage() for stage in STAGES.values()]
+
+
+@dataclass
+class PipelineStats:
+    """Document counts and per-stage rejections of a pipeline run."""
+
+    num_documents: int = 0
+    num_kept: int = 0
+    rejections: dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.num_documents / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class Pipeline:
+    """
+    A chain of stages applied to a stream of documents in a single pass.
+
+    Every stage is wrapped in a generator that pulls documents from the
+    previous one, so documents flow through the whole chain one (batch) at a
+    time without intermediate files, and a document rejected by a stage is
+    never seen by the stages after it.
+    """
+
+    def __init__(self, stages: Sequence[Stage] | None = None):
+        self.stages = list(stages) if stages is not None else default_stages()
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Stage names must be unique, got {names}")
+        self.stats = PipelineStats(rejections={name: 0 for name in names})
+
+    def _run_stage(self, stage: Stage, documents: Iterator[Document]) -> Iterator[Document]:
+        while batch := list(islice(documents, stage.batch_size)):
+            for document in stage.process_batch(batch):
+                if document is None:
+                    self.stats.rejections[stage.name] += 1
+                else:
+                    yield document
+
+    def _count_input(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for document in documents:
+            self.stats.num_documents += 1
+            yield document
+
+    def run(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Lazily filter `documents`, yielding the kept ones and updating `stats`."""
+        start = time.perf_counter()
+        stream = self._count_input(documents)
+        for stage in self.stages:
+            stream = self._run_stage(stage, stream)
+        try:
+            for document in stream:
+                self.stats.num_kept += 1
+                yield document
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+
+def warc_documents(warc_file: str | os.PathLike) -> Iterator[Document]:
+    """Stream the extracted documents of a WARC file."""
+    for record_id, url, text in extract_text_from_warc(warc_file):
+        yield Document(record_id, url, text)
+
+
+def run_pipeline(
+    warc_file: str | os.PathLike,
+    output_path: str | os.PathLike,
+    stages: Sequence[Stage] | None = None,
+    stats_path: str | os.PathLike | None = None,
+) -> PipelineStats:
+    """
+    Filter one WARC shard end to end and write the kept documents as JSON lines.
+
+    Args:
+        warc_file: Path to a (possibly compressed) WARC file
+        output_path: JSONL output path, compressed according to its extension (e.g. .jsonl.gz)
+        stages: Stages to apply (defaults to `default_stages()`)
+        stats_path: If given, the run's `PipelineStats` are also written here as JSON
+
+    Returns:
+        Document counts and per-stage rejections of the run
+    """
+    pipeline = Pipeline(stages)
+    with xopen(output_path, "w") as out:
+        for document in pipeline.run(warc_documents(warc_file)):
+            out.write(document.to_json() + "\n")
+    stats = pipeline.stats
+    if stats_path is not None:
+        with open(stats_path, "w") as f:
+            json.dump(stats.to_dict(), f)
+    logger.info(
+        "Kept %d of %d documents from %s in %.1fs, rejected %s",
+        stats.num_kept,
+        stats.num_documents,
+        warc_file,
+        stats.seconds,
+        stats.rejections,
+    )
+    return stats
+
+
+@dataclass
+class PipelineSummary:
+    """
+    Aggregate counts and throughput of a pipeline run over many shards.
+
+    Counts cover all shards, including those completed by an earlier run, but
+    `seconds` only measures this run, so throughput is computed from the
+    documents and bytes of the shards processed in this run.
+    """
+
+    num_shards: int = 0
+    num_skipped_shards: int = 0
+    num_documents: int = 0
+    num_kept: int = 0
+    num_bytes: int = 0
+    num_processed_documents: int = 0
+    num_processed_bytes: int = 0
+    rejections: dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def add(self, stats: PipelineStats, num_bytes: int, skipped: bool = False) -> None:
+        self.num_documents += stats.num_documents
+        self.num_kept += stats.num_kept
+        self.num_bytes += num_bytes
+        if skipped:
+            self.num_skipped_shards += 1
+        else:
+            self.num_processed_documents += stats.num_documents
+            self.num_processed_bytes += num_bytes
+        for name, count in stats.rejections.items():
+            self.rejections[name] = self.rejections.get(name, 0) + count
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.num_processed_documents / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.num_processed_bytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def rejection_rates(self) -> dict[str, float]:
+        """Fraction of all input documents rejected by each stage."""
+        total = max(self.num_documents, 1)
+        return {name: count / total for name, count in self.rejections.items()}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            **asdict(self),
+            "documents_per_second": self.documents_per_second,
+            "mb_per_second": self.mb_per_second,
+            "rejection_rates": self.rejection_rates,
+        }
+
+
+def shard_output_paths(warc_file: str | os.PathLike, output_directory: str | os.PathLike) -> tuple[Path, Path]:
+    """
+    The JSONL output of a shard and the marker written once it is complete.
+
+    Shards in different directories often share a name (CommonCrawl has a
+    `CC-MAIN-...-00000.warc.gz` in every segment), so the name is suffixed
+    with a short hash of the shard's resolved path.
+    """
+    path = os.path.realpath(warc_file)
+    name = f"{os.path.basename(path)}.{hashlib.sha1(os.fsencode(path)).hexdigest()[:12]}"
+    return Path(output_directory) / f"{name}.jsonl.gz", Path(output_directory) / f"{name}.done"
+
+
+def _run_shard(args: tuple[str, Path, list[Stage]]) -> tuple[str, PipelineStats]:
+    warc_file, output_directory, stages = args
+    output_path, done_path = shard_output_paths(warc_file, output_directory)
+    # Write under a temporary name so an interrupted shard never looks finished.
+    partial_path = output_path.with_name(f"{output_path.name}.partial.gz")
+    stats = run_pipeline(warc_file, partial_path, stages)
+    os.replace(partial_path, output_path)
+    done_path.write_text(json.dumps(stats.to_dict()))
+    return warc_file, stats
+
+
+def run_pipeline_on_shards(
+    warc_files: Iterable[str | os.PathLike],
+    output_directory: str | os.PathLike,
+    stages: Sequence[Stage] | None = None,
+    num_workers: int | None = None,
+    max_in_flight: int | None = None,
+) -> PipelineSummary:
+    """
+    Filter many WARC shards in a process pool, one shard per task.
+
+    Each shard is written to `output_directory` under the names given by
+    `shard_output_paths`: its JSONL output, followed by a `.done` marker
+    holding its `PipelineStats`. Shards that already have a marker are
+    skipped, so an interrupted run can simply be restarted. At most
+    `max_in_flight` shards are queued at once.
+
+    The models used by the stages are loaded once in this process before the
+    workers are forked, so the workers share them instead of loading their own
+    copies.
+
+    Args:
+        warc_files: Paths to WARC shards
+        output_directory: Directory for the outputs, markers and `summary.json`
+        stages: Stages to apply (defaults to `default_stages()`)
+        num_workers: Number of worker processes (defaults to the CPU count)
+        max_in_flight: Maximum number of shards submitted at once (defaults to 2 * num_workers)
+
+    Returns:
+        Aggregate counts over all shards, including the skipped ones, and the
+        throughput of the shards processed in this run
+    """
+    start = time.perf_counter()
+    stages = list(stages) if stages is not None else default_stages()
+    num_workers = num_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * num_workers
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    summary = PipelineSummary(rejections={stage.name: 0 for stage in stages})
+    pending = []
+    shard_of_output: dict[Path, str] = {}
+    for warc_file in sorted(map(os.fspath, warc_files)):
+        summary.num_shards += 1
+        output_path, done_path = shard_output_paths(warc_file, output_directory)
+        if output_path in shard_of_output:
+            raise ValueError(f"{warc_file} and {shard_of_output[output_path]} are the same shard")
+        shard_of_output[output_path] = warc_file
+        if done_path.exists():
+            summary.add(PipelineStats(**json.loads(done_path.read_text())), os.path.getsize(warc_file), skipped=True)
+        else:
+            pending.append(warc_file)
+
+    if pending:
+        model_names = sorted({name for stage in stages for name in stage.models})
+        if model_names:
+            preload_models(*model_names)
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+            tasks = ((warc_file, output_directory, stages) for warc_file in pending)
+            for warc_file, stats in bounded_imap_unordered(executor, _run_shard, tasks, max_in_flight):
+                summary.add(stats, os.path.getsize(warc_file))
+    summary.seconds = time.perf_counter() - start
+
+    (output_directory / "summary.json").write_text(json.dumps(summary.to_dict(), indent=2))
+    logger.info(
+        "Processed %d shards (%d already done): kept %d of %d documents, %.1f documents/s, %.2f MB/s, rejected %s",
+        summary.num_shards,
+        summary.num_skipped_shards,
+        summary.num_kept,
+        summary.num_documents,
+        summary.documents_per_second,
+        summary.mb_per_second,
+        {name: f"{rate:.1%}" for name, rate in summary.rejection_rates.items()},
+    )
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the filtering pipeline over WARC shards in parallel.")
+    parser.add_argument("pattern", help="Glob of WARC shards, e.g. 'data/*.warc.gz'")
+    parser.add_argument("output_directory")
+    parser.add_argument(
+        "--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="Stages to run, in this order"
+    )
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    warc_files = glob.glob(args.pattern, recursive=True)
+    if not warc_files:
+        parser.error(f"No files match {args.pattern!r}")
+    summary = run_pipeline_on_shards(
+        warc_files,
+        args.output_directory,
+        [STAGES[name]() for name in args.stages],
+        num_workers=args.num_workers,
+        max_in_flight=args.max_in_flight,
+    )
+    print(json.dumps(summary.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+import random
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from itertools import chain
+
+import fasttext
+import numpy as np
+import numpy.typing as npt
+
+from cs336_data.models import LABEL_PREFIX, MODEL_FILES, assets_dir, predict_batch
+from cs336_data.pipeline import GopherFilter, LanguageFilter, LengthFilter, Pipeline, Stage, warc_documents
+
+logger = logging.getLogger(__name__)
+
+QUALITY_MODEL = "quality"
+POSITIVE_LABEL = "wiki"
+NEGATIVE_LABEL = "cc"
+
+
+def default_positive_stages() -> list[Stage]:
+    """Filters applied to the extracted reference pages before they become positive examples."""
+    return [LengthFilter(), LanguageFilter(), GopherFilter()]
+
+
+@dataclass
+class TrainingFileStats:
+    num_positives: int = 0
+    num_negatives: int = 0
+
+
+def _texts(warc_files: Iterable[str | os.PathLike], stages: Sequence[Stage] | None) -> Iterator[str]:
+    documents = chain.from_iterable(map(warc_documents, warc_files))
+    if stages is not None:
+        documents = Pipeline(stages).run(documents)
+    for document in documents:
+        yield document.text
+
+
+def _fasttext_line(label: str, text: str) -> str:
+    # One example per line: fastText reads a label followed by whitespace-separated tokens.
+    return f"{LABEL_PREFIX}{label} {' '.join(text.split())}\n"
+
+
+def write_training_file(
+    output_path: str | os.PathLike,
+    positive_warcs: Iterable[str | os.PathLike],
+    negative_warcs: Iterable[str | os.PathLike],
+    positive_stages: Sequence[Stage] | None = None,
+    negative_sample_rate: float = 1.0,
+    max_examples_per_class: int | None = None,
+    seed: int = 0,
+) -> TrainingFileStats:
+    """
+    Stream labeled examples from WARC files into a fastText supervised training file.
+
+    Positive examples are the extracted reference pages that pass
+    `positive_stages`; negative examples are Common Crawl documents, each kept
+    with probability `negative_sample_rate`. Both streams are consumed lazily
+    and written alternately, so the classes are interleaved in the file and
+    neither is ever held in memory. Negatives stop once there are as many as
+    positives.
+
+    Args:
+        output_path: Training file to write
+        positive_warcs: WARC files of the fetched reference pages
+        negative_warcs: WARC files of random Common Crawl pages
+        positive_stages: Filters for the positives (defaults to `default_positive_stages()`)
+        negative_sample_rate: Probability of keeping each negative document
+        max_examples_per_class: Optional cap on the number of examples of each class
+        seed: Seed for sampling the negatives
+
+    Returns:
+        Number of examples written per class
+    """
+    rng = random.Random(seed)
+    positives = _texts(positive_warcs, positive_stages if positive_stages is not None else default_positive_stages())
+    negatives = (text for text in _texts(negative_warcs, None) if text.strip() and rng.random() < negative_sample_rate)
+    stats = TrainingFileStats()
+    with open(output_path, "w") as f:
+        for positive in positives:
+            if max_examples_per_class is not None and stats.num_positives >= max_examples_per_class:
+                break
+            f.write(_fasttext_line(POSITIVE_LABEL, positive))
+            stats.num_positives += 1
+            negative = next(negatives, None)
+            if negative is not None:
+                f.write(_fasttext_line(NEGATIVE_LABEL, negative))
+                stats.num_negatives += 1
+    logger.info(
+        "Wrote %d positive and %d negative examples to %s", stats.num_positives, stats.num_negatives, output_path
+    )
+    return stats
+
+
+def train_quality_classifier(
+    training_file: str | os.PathLike,
+    output_path: str | os.PathLike | None = None,
+    epoch: int = 5,
+    lr: float = 0.1,
+    word_ngrams: int = 2,
+    **kwargs,
+) -> None:
+    """
+    Train the quality classifier with fastText, which streams the training file from disk.
+
+    Args:
+        training_file: File written by `write_training_file`
+        output_path: Where to save the model (defaults to the quality model's path in the assets directory)
+        epoch: Number of passes over the training file
+        lr: Learning rate
+        word_ngrams: Length of the word n-grams used as features
+        kwargs: Further arguments for `fasttext.train_supervised`
+    """
+    if output_path is None:
+        output_path = assets_dir() / MODEL_FILES[QUALITY_MODEL]
+    model = fasttext.train_supervised(
+        input=os.fspath(training_file), epoch=epoch, lr=lr, wordNgrams=word_ngrams, verbose=0, **kwargs
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    model.save_model(os.fspath(output_path))
+    logger.info("Saved quality classifier to %s", output_path)
+
+
+def classify_quality(unicode_text: str) -> tuple[str, float]:
+    labels, scores = classify_quality_batch([unicode_text], batch_size=1)
+    return str(labels[0]), float(scores[0])
+
+
+def classify_quality_batch(
+    texts: Sequence[str], batch_size: int = 1024
+) -> tuple[npt.NDArray[np.str_], npt.NDArray[np.float32]]:
+    """
+    Classify many documents as "wiki" (high quality) or "cc".
+
+    The model is loaded lazily from the assets directory on first use.
+
+    Args:
+        texts: Documents to classify
+        batch_size: Number of documents per fastText call
+
+    Returns:
+        (labels, scores) arrays of length len(texts)
+    """
+    labels, scores = predict_batch([QUALITY_MODEL], texts, batch_size)
+    return labels[:, 0], scores[:, 0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a training file and train the quality classifier.")
+    parser.add_argument("--positives", required=True, help="Glob of WARC files of fetched reference pages")
+    parser.add_argument("--negatives", required=True, help="Glob of WARC files of random Common Crawl pages")
+    parser.add_argument("--training-file", required=True)
+    parser.add_argument("--output", default=None, help="Model path (defaults to the assets directory)")
+    parser.add_argument("--negative-sample-rate", type=float, default=1.0)
+    parser.add_argument("--max-examples-per-class", type=int, default=None)
+    parser.add_argument("--epoch", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    write_training_file(
+        args.training_file,
+        sorted(glob.glob(args.positives)),
+        sorted(glob.glob(args.negatives)),
+        negative_sample_rate=args.negative_sample_rate,
+        max_examples_per_class=args.max_examples_per_class,
+    )
+    train_quality_classifier(args.training_file, args.output, epoch=args.epoch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import numpy.typing as npt
+
+# Every segment of an index directory has its sorted keys in `<prefix>.keys.npy`, written last.
+KEYS_SUFFIX = ".keys.npy"
+
+
+def list_segments(directory: str | os.PathLike) -> list[str]:
+    """Prefixes of the complete segments in `directory`, in the order they were added."""
+    return sorted(str(path)[: -len(KEYS_SUFFIX)] for path in Path(directory).glob(f"segment*{KEYS_SUFFIX}"))
+
+
+def next_segment_prefix(directory: str | os.PathLike, segments: list[str]) -> str:
+    """Prefix of a new segment numbered after the last of `segments`, even if earlier ones were removed."""
+    number = int(Path(segments[-1]).name[len("segment") :]) + 1 if segments else 0
+    return str(Path(directory) / f"segment{number:06d}")
+
+
+@contextmanager
+def atomic_open(path: str | os.PathLike) -> Iterator[BinaryIO]:
+    """Open `path` for writing under a temporary name, which is moved into place only if writing succeeds."""
+    tmp_path = f"{os.fspath(path)}.tmp"
+    with open(tmp_path, "wb") as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+def write_segment(prefix: str, keys: npt.NDArray, arrays: Mapping[str, npt.NDArray]) -> None:
+    """
+    Write the `.npy` files of a segment, finishing with its keys.
+
+    Every file is written under a temporary name and moved into place once
+    complete, and the keys file comes last, so a segment whose keys file
+    exists is complete: an interrupted run never leaves a half-written
+    segment behind, and the next run simply does not list it. Any other files
+    of the segment must therefore be written (with `atomic_open`) before this
+    is called.
+
+    Args:
+        prefix: Prefix of the segment, see `next_segment_prefix`
+        keys: Sorted keys of the segment
+        arrays: Other arrays of the segment by name, each written to `<prefix>.<name>.npy`
+    """
+    for name, array in arrays.items():
+        with atomic_open(f"{prefix}.{name}.npy") as f:
+            np.save(f, array)
+    with atomic_open(f"{prefix}{KEYS_SUFFIX}") as f:
+        np.save(f, keys)
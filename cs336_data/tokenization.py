@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from xopen import xopen
+
+from cs336_data.parallel import bounded_imap_unordered
+
+logger = logging.getLogger(__name__)
+
+# Token ids are stored as uint16, which is what cs336-basics' train.py memory-maps.
+TOKEN_DTYPE = np.uint16
+# Document offsets into the token stream, see `cs336_basics.data.IndexedTokens`.
+OFFSET_DTYPE = np.uint64
+METADATA_DTYPE = np.float32
+
+
+def index_path(output_path: str | os.PathLike) -> Path:
+    """Path of the document offsets written next to a `.bin` file."""
+    return Path(output_path).with_suffix(".idx")
+
+
+def metadata_path(output_path: str | os.PathLike) -> Path:
+    """Path of the per-document metadata written next to a `.bin` file."""
+    return Path(output_path).with_suffix(".meta.npy")
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str):
+    """Load a Hugging Face tokenizer once per process."""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    if len(tokenizer) > np.iinfo(TOKEN_DTYPE).max + 1:
+        raise ValueError(f"Tokenizer {name!r} has {len(tokenizer)} tokens, which do not fit in {TOKEN_DTYPE.__name__}")
+    # Documents are not fed to a model here, so don't warn about their length.
+    tokenizer.model_max_length = sys.maxsize
+    return tokenizer
+
+
+def iter_documents(path: str | os.PathLike) -> Iterator[dict]:
+    """Stream the documents of a (possibly compressed) JSONL file, e.g. a pipeline output."""
+    with xopen(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _metadata_row(document: dict, fields: Sequence[str]) -> list[float]:
+    # Documents without a field, e.g. because a stage did not score them, get NaN.
+    return [math.nan if document.get(name) is None else float(document[name]) for name in fields]
+
+
+@dataclass
+class TokenizationStats:
+    num_files: int = 0
+    num_documents: int = 0
+    num_tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.num_tokens / self.seconds if self.seconds > 0 else 0.0
+
+
+def _chunk_paths(directory: Path, index: int) -> tuple[Path, Path, Path]:
+    stem = directory / f"chunk{index:06d}"
+    return stem.with_suffix(".bin"), stem.with_suffix(".lengths"), stem.with_suffix(".meta")
+
+
+def _tokenize_file(args: tuple[int, Path, Path, str, int, tuple[str, ...]]) -> tuple[int, int, int]:
+    """
+    Tokenize one input file into raw chunk files: uint16 tokens with EOS after
+    every document, the uint64 length of every document, and its metadata.
+    """
+    index, path, directory, tokenizer_name, batch_size, metadata_fields = args
+    tokenizer = get_tokenizer(tokenizer_name)
+    eos = tokenizer.eos_token_id
+    num_documents = num_tokens = 0
+    documents = iter_documents(path)
+    tokens_path, lengths_path, chunk_metadata_path = _chunk_paths(directory, index)
+    with (
+        open(tokens_path, "wb") as out,
+        open(lengths_path, "wb") as lengths_out,
+        open(chunk_metadata_path, "wb") as metadata_out,
+    ):
+        while batch := list(islice(documents, batch_size)):
+            ids = tokenizer([document["text"] for document in batch])["input_ids"]
+            lengths = np.fromiter((len(doc_ids) + 1 for doc_ids in ids), dtype=np.int64, count=len(ids))
+            tokens = np.empty(int(lengths.sum()), dtype=TOKEN_DTYPE)
+            # Each document ends at its cumulative length; its EOS goes in the last slot.
+            ends = np.cumsum(lengths)
+            tokens[ends - 1] = eos
+            for doc_ids, end, length in zip(ids, ends.tolist(), lengths.tolist()):
+                tokens[end - length : end - 1] = doc_ids
+            tokens.tofile(out)
+            lengths.astype(OFFSET_DTYPE).tofile(lengths_out)
+            if metadata_fields:
+                rows = [_metadata_row(document, metadata_fields) for document in batch]
+                np.asarray(rows, dtype=METADATA_DTYPE).tofile(metadata_out)
+            num_documents += len(batch)
+            num_tokens += len(tokens)
+    return index, num_documents, num_tokens
+
+
+def tokenize_to_bin(
+    input_files: Iterable[str | os.PathLike],
+    output_path: str | os.PathLike,
+    tokenizer_name: str = "gpt2",
+    num_workers: int | None = None,
+    batch_size: int = 256,
+    work_directory: str | os.PathLike | None = None,
+    metadata_fields: Sequence[str] = (),
+) -> TokenizationStats:
+    """
+    Tokenize documents into one flat uint16 `.bin` file, as read by cs336-basics' train.py.
+
+    Every input file is tokenized by a worker process in batches of
+    `batch_size` documents and written to its own chunk file, with the EOS
+    token after each document. Once all chunks are done their total length is
+    known, so the output is allocated once and the chunks are copied into it
+    in input order. Token ids never go through a Python list of ints larger
+    than one batch.
+
+    Next to the `.bin` file, two document indexes are written:
+    - `index_path(output_path)`: uint64 offsets of length num_documents + 1,
+      where document i spans tokens [offsets[i], offsets[i + 1]), EOS included.
+    - `metadata_path(output_path)`: a structured .npy array with one row per
+      document, holding the index of its input file ("shard") and a float32
+      column per name in `metadata_fields` (NaN where a document lacks it).
+
+    Args:
+        input_files: JSONL files of documents with a "text" field
+        output_path: Path of the `.bin` file to write
+        tokenizer_name: Hugging Face tokenizer name or path
+        num_workers: Number of worker processes (defaults to the CPU count)
+        batch_size: Number of documents per tokenizer call
+        work_directory: Where to put the chunk files (defaults to the system temp directory)
+        metadata_fields: Numeric document fields to keep, e.g. a quality score added by the pipeline
+
+    Returns:
+        Document and token counts
+    """
+    start = time.perf_counter()
+    input_files = [Path(path) for path in input_files]
+    metadata_fields = tuple(metadata_fields)
+    num_workers = num_workers or os.cpu_count() or 1
+    stats = TokenizationStats(num_files=len(input_files))
+    with (
+        tempfile.TemporaryDirectory(dir=work_directory, prefix="tokenize_") as tmp,
+        ProcessPoolExecutor(max_workers=num_workers) as executor,
+    ):
+        tasks = [
+            (i, path, Path(tmp), tokenizer_name, batch_size, metadata_fields) for i, path in enumerate(input_files)
+        ]
+        chunk_documents = [0] * len(input_files)
+        chunk_tokens = [0] * len(input_files)
+        results = bounded_imap_unordered(executor, _tokenize_file, tasks, 2 * num_workers)
+        for index, num_documents, num_tokens in results:
+            chunk_documents[index] = num_documents
+            chunk_tokens[index] = num_tokens
+            stats.num_documents += num_documents
+            stats.num_tokens += num_tokens
+
+        output = np.memmap(output_path, dtype=TOKEN_DTYPE, mode="w+", shape=(max(stats.num_tokens, 1),))
+        offsets = np.memmap(index_path(output_path), dtype=OFFSET_DTYPE, mode="w+", shape=(stats.num_documents + 1,))
+        metadata_dtype = np.dtype([("shard", "<u4")] + [(name, METADATA_DTYPE) for name in metadata_fields])
+        if stats.num_documents:
+            metadata = open_memmap(
+                metadata_path(output_path), mode="w+", dtype=metadata_dtype, shape=(stats.num_documents,)
+            )
+        else:
+            # Memory maps cannot be empty.
+            np.save(metadata_path(output_path), np.empty(0, dtype=metadata_dtype))
+        offsets[0] = 0
+        token_offset = document_offset = 0
+        for index, (num_documents, num_tokens) in enumerate(zip(chunk_documents, chunk_tokens)):
+            if not num_documents:
+                continue
+            tokens_path, lengths_path, chunk_metadata_path = _chunk_paths(Path(tmp), index)
+            documents = slice(document_offset, document_offset + num_documents)
+            if num_tokens:
+                tokens = np.memmap(tokens_path, dtype=TOKEN_DTYPE, mode="r")
+                output[token_offset : token_offset + num_tokens] = tokens
+            lengths = np.fromfile(lengths_path, dtype=OFFSET_DTYPE)
+            offsets[document_offset + 1 : document_offset + num_documents + 1] = token_offset + np.cumsum(lengths)
+            metadata["shard"][documents] = index
+            if metadata_fields:
+                values = np.fromfile(chunk_metadata_path, dtype=METADATA_DTYPE).reshape(num_documents, -1)
+                for column, name in enumerate(metadata_fields):
+                    metadata[name][documents] = values[:, column]
+            token_offset += num_tokens
+            document_offset += num_documents
+        output.flush()
+        offsets.flush()
+        del output, offsets
+        if stats.num_documents:
+            metadata.flush()
+            del metadata
+    if stats.num_tokens == 0:
+        # np.memmap cannot map an empty file, so truncate the placeholder token.
+        os.truncate(output_path, 0)
+
+    stats.seconds = time.perf_counter() - start
+    logger.info(
+        "Tokenized %d documents from %d files into %d tokens in %.1fs (%.0f tokens/s)",
+        stats.num_documents,
+        stats.num_files,
+        stats.num_tokens,
+        stats.seconds,
+        stats.tokens_per_second,
+    )
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokenize filtered JSONL documents into a uint16 .bin file.")
+    parser.add_argument("pattern", help="Glob of JSONL files, e.g. 'filtered/*.jsonl.gz'")
+    parser.add_argument("output_path")
+    parser.add_argument("--tokenizer", default="gpt2")
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--metadata-fields", nargs="*", default=(), help="Numeric document fields to keep in the metadata file"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    input_files = sorted(glob.glob(args.pattern, recursive=True))
+    if not input_files:
+        parser.error(f"No files match {args.pattern!r}")
+    tokenize_to_bin(
+        input_files,
+        args.output_path,
+        args.tokenizer,
+        args.num_workers,
+        args.batch_size,
+        metadata_fields=args.metadata_fields,
+    )
+
+
+if __name__ == "__main__":
+    main()
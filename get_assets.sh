@@ -2,7 +2,8 @@
 
 # Define the target directory
 SOURCE_DIR="/data/classifiers"
-ASSETS_DIR="$(pwd)/cs336_data/assets"
+ASSETS_DIR="${CS336_DATA_ASSETS:-$(pwd)/cs336_data/assets}"
+mkdir -p "$ASSETS_DIR"
 
 # Function to handle each file
 handle_file() {
@@ -23,5 +24,6 @@ handle_file() {
 }
 
 # Handle each file
+handle_file "lid.176.bin" "https://dl.fbaipublicfiles.com/fasttext/supervised-models/lid.176.bin"
 handle_file "dolma_fasttext_nsfw_jigsaw_model.bin" "https://huggingface.co/allenai/dolma-jigsaw-fasttext-bigrams-nsfw/resolve/main/model.bin"
 handle_file "dolma_fasttext_hatespeech_jigsaw_model.bin" "https://huggingface.co/allenai/dolma-jigsaw-fasttext-bigrams-hatespeech/resolve/main/model.bin"
\ No newline at end of file
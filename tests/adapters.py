@@ -1,9 +1,12 @@
 from __future__ import annotations
 from cs336_data.extract_text import extract_text 
-from cs336_data.language_identification import identify_language
-from cs336_data.mask_emails import mask_emails, mask_phone_numbers, mask_ip_addresses
-from cs336_data.harmful_content import identify_hatespeech, identify_nsfw
+from cs336_data.language_identification import identify_language, identify_language_batch
+from cs336_data.mask_emails import mask_emails, mask_phone_numbers, mask_ip_addresses, mask_pii
+from cs336_data.harmful_content import classify_harmful_batch, identify_hatespeech, identify_nsfw
 from cs336_data.gopher_filters import gopher_quality_filter
+from cs336_data.quality_classifier import classify_quality
+from cs336_data.deduplication import exact_line_deduplication
+from cs336_data.minhash import minhash_deduplication
 import os
 from typing import Any
 
@@ -17,6 +20,10 @@ def run_identify_language(text: str) -> tuple[Any, float]:
     return identify_language(text)
 
 
+def run_identify_language_batch(texts: list[str], k: int = 1) -> tuple[Any, Any]:
+    return identify_language_batch(texts, k=k)
+
+
 def run_mask_emails(text: str) -> tuple[str, int]:
     return mask_emails(text)
 
@@ -29,6 +36,10 @@ def run_mask_ips(text: str) -> tuple[str, int]:
     return mask_ip_addresses(text)
 
 
+def run_mask_pii(text: str, kinds: tuple[str, ...] = ("email", "ip", "phone")) -> tuple[str, dict[str, int]]:
+    return mask_pii(text, kinds=kinds)
+
+
 def run_classify_nsfw(text: str) -> tuple[Any, float]:
     return identify_nsfw(text)
 
@@ -37,8 +48,12 @@ def run_classify_toxic_speech(text: str) -> tuple[Any, float]:
     return identify_hatespeech(text)
 
 
+def run_classify_harmful_batch(texts: list[str]) -> tuple[Any, Any]:
+    return classify_harmful_batch(texts)
+
+
 def run_classify_quality(text: str) -> tuple[Any, float]:
-    raise NotImplementedError
+    return classify_quality(text)
 
 
 def run_gopher_quality_filter(text: str) -> bool:
@@ -48,7 +63,7 @@ def run_gopher_quality_filter(text: str) -> bool:
 def run_exact_line_deduplication(
     input_files: list[os.PathLike], output_directory: os.PathLike
 ):
-    raise NotImplementedError
+    exact_line_deduplication(input_files, output_directory)
 
 
 def run_minhash_deduplication(
@@ -59,4 +74,11 @@ def run_minhash_deduplication(
     jaccard_threshold: float,
     output_directory: os.PathLike,
 ):
-    raise NotImplementedError
+    minhash_deduplication(
+        input_files,
+        num_hashes=num_hashes,
+        num_bands=num_bands,
+        ngrams=ngrams,
+        jaccard_threshold=jaccard_threshold,
+        output_directory=output_directory,
+    )
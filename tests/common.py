@@ -1,3 +1,31 @@
 import pathlib
+import uuid
+
+from fastwarc import WarcRecord, WarcRecordType
 
 FIXTURES_PATH = (pathlib.Path(__file__).resolve().parent) / "fixtures"
+
+
+def write_warc(path: pathlib.Path, pages: list[tuple[str, bytes]], content_types: list[str] | None = None) -> None:
+    """Write a WARC file with one response record per (url, html_bytes) page, served as text/html by default."""
+    with open(path, "wb") as f:
+        for (url, html), content_type in zip(pages, content_types or ["text/html"] * len(pages)):
+            record = WarcRecord()
+            record.init_headers(record_type=WarcRecordType.response, record_urn=str(uuid.uuid4()).encode())
+            record.headers["WARC-Target-URI"] = url
+            record.headers["Content-Type"] = "application/http; msgtype=response"
+            http_headers = f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n\r\n".encode()
+            record.set_bytes_content(http_headers + html)
+            record.write(f)
+
+
+def write_wet(path: pathlib.Path, documents: list[tuple[str, str]]) -> None:
+    """Write a WET file with one plain-text conversion record per (url, text) document."""
+    with open(path, "wb") as f:
+        for url, text in documents:
+            record = WarcRecord()
+            record.init_headers(record_type=WarcRecordType.conversion, record_urn=str(uuid.uuid4()).encode())
+            record.headers["WARC-Target-URI"] = url
+            record.headers["Content-Type"] = "text/plain"
+            record.set_bytes_content(text.encode())
+            record.write(f)
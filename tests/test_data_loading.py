@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from cs336_basics.data import BatchLoader, batch_from_starts, get_batch
+
+
+def get_batch_per_row(dataset, batch_size, context_length, device):
+    # The previous `get_batch`, which sliced, cast and stacked every row separately.
+    starting_idxs = torch.randint(len(dataset) - context_length, (batch_size,))
+    x = torch.stack([torch.from_numpy((dataset[i : i + context_length]).astype(np.int64)) for i in starting_idxs])
+    y = torch.stack(
+        [torch.from_numpy((dataset[i + 1 : i + 1 + context_length]).astype(np.int64)) for i in starting_idxs]
+    )
+    return x.to(device), y.to(device)
+
+
+def write_tokens(path, num_tokens, seed=0):
+    tokens = np.memmap(path, dtype=np.uint16, mode="w+", shape=(num_tokens,))
+    tokens[:] = np.random.default_rng(seed).integers(0, np.iinfo(np.uint16).max + 1, num_tokens, dtype=np.uint16)
+    tokens.flush()
+    return np.memmap(path, dtype=np.uint16, mode="r")
+
+
+def test_get_batch_matches_per_row_reference(tmp_path):
+    dataset = write_tokens(tmp_path / "tokens.bin", 1000)
+    for batch_size, context_length in [(1, 1), (8, 16), (32, 999)]:
+        torch.manual_seed(0)
+        x, y = get_batch(dataset, batch_size, context_length, "cpu")
+        torch.manual_seed(0)
+        x_ref, y_ref = get_batch_per_row(dataset, batch_size, context_length, "cpu")
+        assert x.shape == y.shape == (batch_size, context_length)
+        assert x.dtype == y.dtype == x_ref.dtype == torch.int64
+        assert torch.equal(x, x_ref)
+        assert torch.equal(y, y_ref)
+        assert torch.equal(x[:, 1:], y[:, :-1])
+    # Token ids above int16's range survive the cast from uint16.
+    assert x.min() >= 0 and x.max() > np.iinfo(np.int16).max
+
+
+class SlowTokens:
+    """Token ids that take `delay` seconds per read, or fail every read if `error` is set."""
+
+    def __init__(self, tokens, delay=0.0, error=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __getitem__(self, idxs):
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.tokens[idxs]
+
+
+def test_batch_loader_matches_batch_from_starts(tmp_path):
+    dataset = write_tokens(tmp_path / "tokens.bin", 1000)
+    generator = torch.Generator().manual_seed(3)
+    with BatchLoader(dataset, 4, 16, "cpu", seed=3, queue_depth=2) as loader:
+        for _ in range(10):
+            x, y = next(loader)
+            starts = torch.randint(len(dataset) - 16, (4,), generator=generator)
+            x_ref, y_ref = batch_from_starts(dataset, starts, 16, "cpu")
+            assert x.dtype == torch.int64
+            assert torch.equal(x, x_ref) and torch.equal(y, y_ref)
+
+
+def test_batch_loader_keeps_held_batch_while_buffers_rotate(tmp_path):
+    dataset = write_tokens(tmp_path / "tokens.bin", 1000)
+    with BatchLoader(dataset, 4, 16, "cpu", seed=0, queue_depth=1) as loader:
+        held, expected = None, None
+        # queue_depth + 2 = 3 buffers go around several times.
+        for _ in range(12):
+            x, y = next(loader)
+            # Give the thread time to refill every buffer it was handed back.
+            time.sleep(0.01)
+            if held is not None:
+                assert torch.equal(held[0], expected[0]) and torch.equal(held[1], expected[1])
+            held, expected = (x, y), (x.clone(), y.clone())
+
+
+def test_batch_loader_reraises_worker_errors(tmp_path):
+    tokens = write_tokens(tmp_path / "tokens.bin", 1000)
+    loader = BatchLoader(SlowTokens(tokens, error=OSError("disk went away")), 4, 16, "cpu", seed=0)
+    # The error stays in place, so later calls fail too instead of blocking.
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="failed to assemble a batch") as excinfo:
+            next(loader)
+        assert isinstance(excinfo.value.__cause__, OSError)
+    loader._thread.join(timeout=5)
+    assert not loader._thread.is_alive()
+
+
+def test_batch_loader_close_stops_thread_and_counts_waits(tmp_path):
+    tokens = write_tokens(tmp_path / "tokens.bin", 1000)
+    loader = BatchLoader(SlowTokens(tokens, delay=0.05), 4, 16, "cpu", seed=0, queue_depth=1)
+    for _ in range(3):
+        next(loader)
+    # The first batch cannot be ready yet, and later ones take longer to read than to take.
+    assert loader.stats.batches == 3
+    assert 1 <= loader.stats.waits <= 3
+    assert loader.stats.wait_seconds > 0
+    loader.close()
+    assert not loader._thread.is_alive()
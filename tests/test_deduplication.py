@@ -1,7 +1,11 @@
 import logging
 
+import numpy as np
+import pytest
 from xopen import xopen
 
+from cs336_data.deduplication import LineHashCounter, LineHashIndex, exact_line_deduplication, line_hashes
+
 from .adapters import run_exact_line_deduplication, run_minhash_deduplication
 from .common import FIXTURES_PATH
 
@@ -40,6 +44,86 @@ def test_exact_line_deduplication(tmp_path):
     assert len(deduplicated_documents) == 0
 
 
+def test_line_hash_counter_merges_batches():
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 1000, size=10_000).astype(np.uint64)
+    counter = LineHashCounter(buffer_size=777)
+    for batch in np.array_split(hashes, 37):
+        counter.add(batch)
+
+    keys, counts = np.unique(hashes, return_counts=True)
+    assert len(counter) == len(keys)
+    queries = np.arange(1100, dtype=np.uint64)
+    expected = np.zeros(len(queries), dtype=np.int64)
+    expected[keys.astype(np.int64)] = counts
+    assert (counter.counts_of(queries) == np.minimum(expected, 255)).all()
+    assert counter.peak_nbytes > 0
+
+
+def test_line_hash_counter_merges_runs():
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 1 << 63, size=50_000, dtype=np.uint64)
+    hashes = np.concatenate([hashes, hashes[::7], np.full(300, 42, dtype=np.uint64)])
+    counter = LineHashCounter(buffer_size=500)
+    for batch in np.array_split(rng.permutation(hashes), 250):
+        counter.add(batch)
+        # Runs are merged like a binary counter, so there are only logarithmically many.
+        assert len(counter._runs) <= 2 + np.log2(max(len(hashes), 2))
+
+    keys, counts = np.unique(hashes, return_counts=True)
+    assert (counter.counts_of(keys) == np.minimum(counts, 255)).all()
+    assert (counter.keys == keys).all()
+    assert (counter.counts == np.minimum(counts, 255)).all()
+    assert len(counter._runs) == 1
+
+
+def test_exact_line_deduplication_parallel_matches_serial(tmp_path):
+    rng = np.random.default_rng(0)
+    input_files = []
+    for i in range(6):
+        input_files.append(tmp_path / f"doc{i}.txt")
+        input_files[-1].write_text("".join(f"line {x}\n" for x in rng.integers(0, 3000, size=1000)))
+
+    serial_stats = exact_line_deduplication(input_files, tmp_path / "serial")
+    parallel_stats = exact_line_deduplication(
+        input_files, tmp_path / "parallel", chunk_lines=100, num_workers=3, num_shards=5, work_directory=tmp_path
+    )
+
+    for path in input_files:
+        assert (tmp_path / "serial" / path.name).read_text() == (tmp_path / "parallel" / path.name).read_text()
+    assert parallel_stats.num_lines == serial_stats.num_lines == 6000
+    assert parallel_stats.num_kept_lines == serial_stats.num_kept_lines
+    assert parallel_stats.num_unique_hashes == serial_stats.num_unique_hashes
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == ["parallel", "serial"]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_exact_line_deduplication_incremental_index(tmp_path, num_workers):
+    runs = [
+        {"a.txt": "common\nonly a\n"},
+        {"b.txt": "common\nonly b\nrepeat\n", "c.txt": "repeat\nonly c\n"},
+        {"d.txt": "only a\nonly d\n"},
+    ]
+    expected = [{"a.txt": "common\nonly a\n"}, {"b.txt": "only b\n", "c.txt": "only c\n"}, {"d.txt": "only d\n"}]
+    index_directory = tmp_path / "index"
+    for run, (documents, expected_documents) in enumerate(zip(runs, expected)):
+        input_files = []
+        for name, text in documents.items():
+            input_files.append(tmp_path / name)
+            input_files[-1].write_text(text)
+        if run == 2:
+            LineHashIndex(index_directory).compact()
+        exact_line_deduplication(
+            input_files, tmp_path / f"run{run}", num_workers=num_workers, index_directory=index_directory
+        )
+        for name, text in expected_documents.items():
+            assert (tmp_path / f"run{run}" / name).read_text() == text
+
+    index = LineHashIndex(index_directory)
+    assert len(index) == 2
+    assert index.counts_of(line_hashes([b"common", b"repeat", b"only d", b"missing"])).tolist() == [2, 2, 1, 0]
+
+
 def test_minhash_deduplication_exact_duplicates(tmp_path):
     """
     Check that minhash deduplication properly identifies and removes exact duplicates.
@@ -1,7 +1,9 @@
 import logging
 
+from cs336_data.extract_text import extract_text_from_warc, extract_text_from_warcs
+
 from .adapters import run_extract_text_from_html_bytes
-from .common import FIXTURES_PATH
+from .common import FIXTURES_PATH, write_warc, write_wet
 
 logger = logging.getLogger(__name__)
 
@@ -14,3 +16,82 @@ def test_extract_text_from_html_bytes():
     with open(moby_expected_path) as f:
         moby_expected_text = f.read()
     assert moby_expected_text == run_extract_text_from_html_bytes(moby_bytes)
+
+
+def test_extract_text_from_warcs(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    with open(FIXTURES_PATH / "moby_extracted.txt") as f:
+        moby_expected_text = f.read()
+    warc_paths = []
+    for shard in range(3):
+        warc_paths.append(tmp_path / f"shard{shard}.warc")
+        write_warc(warc_paths[-1], [(f"http://example.com/{shard}/{page}", moby_bytes) for page in range(2)])
+
+    shard_stats = []
+    (tmp_path / "work").mkdir()
+    records = extract_text_from_warcs(
+        warc_paths, num_workers=2, max_in_flight=2, shard_stats=shard_stats, work_directory=tmp_path / "work"
+    )
+    # Workers spill their shards to files, which are read back one record at a time and then removed.
+    first = next(records)
+    assert list((tmp_path / "work").glob("extract_*/shard*.jsonl"))
+    records = [first, *records]
+    assert not list((tmp_path / "work").iterdir())
+
+    assert sorted(url for _, url, _ in records) == [f"http://example.com/{s}/{p}" for s in range(3) for p in range(2)]
+    assert all(text == moby_expected_text for _, _, text in records)
+    assert len({record_id for record_id, _, _ in records}) == 6
+    assert sorted(stats.path for stats in shard_stats) == sorted(str(path) for path in warc_paths)
+    assert all(stats.num_records == 2 and stats.records_per_second > 0 for stats in shard_stats)
+
+
+def test_extract_text_from_warc_uses_declared_charset(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    with open(FIXTURES_PATH / "moby_extracted.txt") as f:
+        moby_expected_text = f.read()
+    latin_page = "<html><body><p>Un café à Paris, déjà vu.</p></body></html>".encode("cp1252")
+    pages = [
+        ("http://example.com/moby", moby_bytes),
+        ("http://example.com/latin", latin_page),
+        ("http://example.com/unknown-charset", latin_page),
+        ("http://example.com/image.png", b"\x89PNG\r\n\x1a\n"),
+    ]
+    content_types = [
+        "text/html; charset=UTF-8",
+        "text/html; charset=windows-1252",
+        "text/html; charset=bogus",
+        "image/png",
+    ]
+    write_warc(tmp_path / "shard.warc", pages, content_types)
+
+    records = list(extract_text_from_warc(tmp_path / "shard.warc"))
+    assert [url for _, url, _ in records] == [url for url, _ in pages[:3]]
+    assert records[0][2] == moby_expected_text
+    assert records[1][2] == "Un café à Paris, déjà vu."
+    assert list(extract_text_from_warc(tmp_path / "shard.warc", num_threads=3)) == records
+
+
+def test_extract_text_from_mixed_warc_and_wet_shards(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    with open(FIXTURES_PATH / "moby_extracted.txt") as f:
+        moby_expected_text = f.read()
+    write_warc(tmp_path / "shard.warc", [("http://example.com/warc", moby_bytes)])
+    wet_documents = [
+        ("http://example.com/wet/0", "Plain text\nwith ünïcode"),
+        ("http://example.com/wet/1", moby_expected_text),
+    ]
+    write_wet(tmp_path / "shard.warc.wet", wet_documents)
+
+    assert [text for _, _, text in extract_text_from_warc(tmp_path / "shard.warc.wet")] == [
+        "Plain text\nwith ünïcode",
+        moby_expected_text,
+    ]
+    records = extract_text_from_warcs([tmp_path / "shard.warc", tmp_path / "shard.warc.wet"], num_workers=2)
+    assert sorted((url, text) for _, url, text in records) == [
+        ("http://example.com/warc", moby_expected_text),
+        ("http://example.com/wet/0", "Plain text\nwith ünïcode"),
+        ("http://example.com/wet/1", moby_expected_text),
+    ]
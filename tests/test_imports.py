@@ -0,0 +1,51 @@
+import logging
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+MODULES = [
+    "cs336_data.extract_text",
+    "cs336_data.language_identification",
+    "cs336_data.mask_emails",
+    "cs336_data.harmful_content",
+    "cs336_data.gopher_filters",
+    "cs336_data.deduplication",
+    "cs336_data.minhash",
+    "cs336_data.pipeline",
+    "cs336_data.models",
+    "cs336_data.quality_classifier",
+    "cs336_data.tokenization",
+    "cs336_data.parallel",
+    "cs336_data.segments",
+]
+
+# Heavy optional dependencies, which must only be imported once a model or tokenizer is needed.
+HEAVY_MODULES = ("nltk", "torch", "transformers")
+
+# Generous enough for slow CI machines; a model load or NLTK download at import blows far past it.
+IMPORT_BUDGET_SECONDS = 2.0
+
+
+def import_times(modules: list[str]) -> tuple[str, dict[str, float]]:
+    """Import `modules` in a fresh interpreter, returning its stdout and the cumulative import time of each module."""
+    code = f"import sys; import {', '.join(modules)}; print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True, timeout=120
+    )
+    seconds = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                seconds[name.strip()] = int(cumulative) / 1e6
+    return result.stdout, seconds
+
+
+def test_imports_are_side_effect_free_and_fast():
+    stdout, seconds = import_times(MODULES)
+    # Nothing is printed at import time, and heavy optional dependencies stay unloaded.
+    assert stdout == "[]\n"
+    total = sum(seconds[module] for module in MODULES if module in seconds)
+    logger.info("cs336_data import time: %.3fs (%s)", total, {m: round(seconds.get(m, 0.0), 3) for m in MODULES})
+    assert total < IMPORT_BUDGET_SECONDS
@@ -1,6 +1,6 @@
 import logging
 
-from .adapters import run_identify_language
+from .adapters import run_identify_language, run_identify_language_batch
 from .common import FIXTURES_PATH
 
 logger = logging.getLogger(__name__)
@@ -25,3 +25,18 @@ def test_identify_language_chinese_simplified():
     assert predicted_language == "zh"
     assert isinstance(score, float)
     assert score > 0
+
+
+def test_identify_language_batch():
+    moby_expected_path = FIXTURES_PATH / "moby_extracted.txt"
+    with open(moby_expected_path) as f:
+        moby_expected_text = f.read()
+    texts = [moby_expected_text, "欢迎来到我们的网站"] * 3
+    labels, scores = run_identify_language_batch(texts, k=2)
+    assert labels.shape == scores.shape == (6, 2)
+    assert list(labels[:, 0]) == ["en", "zh"] * 3
+    assert (scores[:, 0] >= scores[:, 1]).all()
+    for text, label, score in zip(texts, labels[:, 0], scores[:, 0]):
+        predicted_language, expected_score = run_identify_language(text)
+        assert label == predicted_language
+        assert abs(score - expected_score) < 1e-6
@@ -0,0 +1,264 @@
+import logging
+import shutil
+
+import numpy as np
+import pytest
+
+from cs336_data.minhash import (
+    MinHasher,
+    MinHashIndex,
+    SignatureStore,
+    UnionFind,
+    compute_signatures,
+    minhash_deduplication,
+)
+
+from .common import FIXTURES_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def test_minhash_signatures_estimate_jaccard():
+    paths = sorted((FIXTURES_PATH / "documents_with_fuzzy_duplicates").glob("*.txt"))
+    documents = {path.name: path.read_text() for path in paths}
+    minhasher = MinHasher(num_hashes=500, ngrams=5)
+    signatures = minhasher.signatures(list(documents.values()))
+    assert signatures.shape == (3, 500)
+    assert signatures.dtype == np.uint32
+
+    names = list(documents)
+    ngram_hashes = [minhasher.ngram_hashes(documents[name]) for name in names]
+    for i in range(len(names)):
+        assert (minhasher.signature(documents[names[i]]) == signatures[i]).all()
+        for j in range(i + 1, len(names)):
+            intersection = len(np.intersect1d(ngram_hashes[i], ngram_hashes[j]))
+            jaccard = intersection / (len(ngram_hashes[i]) + len(ngram_hashes[j]) - intersection)
+            agreement = (signatures[i] == signatures[j]).mean()
+            assert abs(agreement - jaccard) < 0.05
+
+
+def test_minhash_signatures_blocking_and_empty_documents(monkeypatch):
+    rng = np.random.default_rng(0)
+    documents = [" ".join(rng.choice(["a", "b", "c", "d", "e", "f"], size=n)) for n in (200, 3, 0, 50)]
+    minhasher = MinHasher(num_hashes=64, ngrams=4, seed=1)
+    expected = np.stack([minhasher.signature(document) for document in documents])
+    assert (expected[2] == np.iinfo(np.uint32).max).all()
+
+    monkeypatch.setattr("cs336_data.minhash.MAX_BLOCK_ELEMENTS", 64 * 10)
+    assert (minhasher.signatures(documents) == expected).all()
+
+
+def test_union_find():
+    clusters = UnionFind(6)
+    assert clusters.union(0, 3)
+    assert clusters.union(4, 3)
+    assert not clusters.union(0, 4)
+    assert clusters.union(1, 5)
+    roots = clusters.roots()
+    assert roots[0] == roots[3] == roots[4]
+    assert roots[1] == roots[5]
+    assert len(set(roots.tolist())) == 3
+    assert clusters.roots_of(np.array([4, 5, 2])).tolist() == [roots[4], roots[5], 2]
+
+
+def test_minhash_deduplication_stats(tmp_path):
+    input_files = sorted((FIXTURES_PATH / "documents_with_fuzzy_duplicates").glob("*.txt"))
+    stats = minhash_deduplication(
+        input_files,
+        num_hashes=500,
+        num_bands=50,
+        ngrams=5,
+        jaccard_threshold=0.8,
+        output_directory=tmp_path,
+        verify="signature",
+    )
+    assert stats.num_documents == 3
+    assert stats.num_candidate_pairs >= stats.num_duplicate_pairs == 1
+    assert stats.num_kept_documents == 2
+    # The representative is the first cluster member in input order.
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["pytorch_license.txt", "rails_mit_license.txt"]
+
+
+@pytest.mark.parametrize("verify", ["jaccard", "signature"])
+def test_minhash_deduplication_out_of_core_matches_in_memory(tmp_path, verify):
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(500)]
+    base = [rng.choice(words, size=200) for _ in range(4)]
+    input_files = list(sorted((FIXTURES_PATH / "documents_with_fuzzy_duplicates").glob("*.txt")))
+    for i in range(12):
+        document = base[i % 4].copy()
+        document[rng.integers(0, 200, size=i)] = "edit"
+        path = tmp_path / f"doc{i:02d}.txt"
+        path.write_text(" ".join(document))
+        input_files.append(path)
+    (tmp_path / "empty.txt").write_text("")
+    input_files.append(tmp_path / "empty.txt")
+
+    kwargs = dict(num_hashes=100, num_bands=20, ngrams=3, jaccard_threshold=0.7, verify=verify)
+    expected = minhash_deduplication(input_files, output_directory=tmp_path / "in_memory", **kwargs)
+    # A tiny budget and batch size force several spill partitions and batches.
+    stats = minhash_deduplication(
+        input_files,
+        output_directory=tmp_path / "out_of_core",
+        work_directory=tmp_path / "work",
+        memory_budget_bytes=4096,
+        batch_docs=4,
+        **kwargs,
+    )
+    # Pairs are counted once per partition, but every merge of two clusters is still a verified duplicate.
+    assert stats.num_duplicate_pairs >= len(input_files) - stats.num_kept_documents
+    assert stats.num_kept_documents == expected.num_kept_documents < len(input_files)
+    assert sorted(path.name for path in (tmp_path / "out_of_core").iterdir()) == sorted(
+        path.name for path in (tmp_path / "in_memory").iterdir()
+    )
+    assert SignatureStore.open(tmp_path / "work" / "signatures.npy").signatures.shape == (len(input_files), 100)
+
+    # Within a single partition, buckets are verified exactly as in memory.
+    stats = minhash_deduplication(
+        input_files, output_directory=tmp_path / "one_partition", work_directory=tmp_path / "work", **kwargs
+    )
+    assert stats.num_candidate_pairs == expected.num_candidate_pairs
+    assert stats.num_duplicate_pairs == expected.num_duplicate_pairs
+    assert stats.num_kept_documents == expected.num_kept_documents
+
+
+def write_bucket_with_unrelated_first_document(directory):
+    # With a single hash, all three documents share the bucket of the minimal word, which is all
+    # that "a" contains, so "a" fails verification against both near-duplicates that follow it.
+    minhasher = MinHasher(num_hashes=1, ngrams=1)
+    words = [f"word{i}" for i in range(41)]
+    hashes = [int(minhasher.signature(word)[0]) for word in words]
+    order = sorted(range(len(words)), key=hashes.__getitem__)
+    documents = {
+        "a.txt": words[order[0]],
+        "b.txt": " ".join(words[i] for i in order[:-1]),
+        "c.txt": " ".join(words),
+    }
+    paths = []
+    for name, text in documents.items():
+        paths.append(directory / name)
+        paths[-1].write_text(text)
+    return paths
+
+
+@pytest.mark.parametrize("directory_kwarg", [None, "work_directory", "index_directory"])
+def test_minhash_deduplication_unrelated_first_document(tmp_path, directory_kwarg):
+    input_files = write_bucket_with_unrelated_first_document(tmp_path)
+    kwargs = {directory_kwarg: tmp_path / "state"} if directory_kwarg else {}
+    stats = minhash_deduplication(
+        input_files,
+        num_hashes=1,
+        num_bands=1,
+        ngrams=1,
+        jaccard_threshold=0.8,
+        output_directory=tmp_path / "deduplicated",
+        **kwargs,
+    )
+    assert stats.num_candidate_pairs == 3
+    assert stats.num_duplicate_pairs == 1
+    assert sorted(path.name for path in (tmp_path / "deduplicated").iterdir()) == ["a.txt", "b.txt"]
+
+
+@pytest.mark.parametrize("work_directory", [None, "work"])
+def test_minhash_deduplication_star_pairs(tmp_path, work_directory):
+    # Every bucket holds all copies, which only yields the pairs of the first copy with the others.
+    input_files = []
+    for i in range(10):
+        input_files.append(tmp_path / f"copy{i}.txt")
+        input_files[-1].write_text("the same words in the same order in every copy")
+    stats = minhash_deduplication(
+        input_files,
+        num_hashes=20,
+        num_bands=5,
+        ngrams=2,
+        jaccard_threshold=0.8,
+        output_directory=tmp_path / "deduplicated",
+        work_directory=work_directory and tmp_path / work_directory,
+    )
+    assert stats.num_candidate_pairs == stats.num_duplicate_pairs == 9
+    assert [path.name for path in (tmp_path / "deduplicated").iterdir()] == ["copy0.txt"]
+    if work_directory:
+        assert not list((tmp_path / work_directory).glob("buckets*.bin"))
+
+
+def test_compute_signatures_parallel(tmp_path):
+    rng = np.random.default_rng(0)
+    documents = [" ".join(rng.choice(["a", "b", "c", "d", "e", "f"], size=n)) for n in (0, *rng.integers(1, 300, 20))]
+    input_files = []
+    for i, document in enumerate(documents):
+        input_files.append(tmp_path / f"doc{i:02d}.txt")
+        input_files[-1].write_text(document)
+    minhasher = MinHasher(num_hashes=32, ngrams=3, seed=2)
+
+    has_ngrams = compute_signatures(input_files, minhasher, tmp_path / "signatures.npy", num_workers=3, batch_docs=2)
+    assert has_ngrams.tolist() == [bool(document) for document in documents]
+    signatures = SignatureStore.open(tmp_path / "signatures.npy").signatures
+    assert (signatures == minhasher.signatures(documents)).all()
+
+    stats = minhash_deduplication(
+        sorted((FIXTURES_PATH / "documents_with_fuzzy_duplicates").glob("*.txt")),
+        num_hashes=500,
+        num_bands=50,
+        ngrams=5,
+        jaccard_threshold=0.8,
+        output_directory=tmp_path / "deduplicated",
+        num_workers=2,
+    )
+    assert stats.num_duplicate_pairs == 1
+    assert stats.num_kept_documents == 2
+
+
+@pytest.mark.parametrize("verify", ["jaccard", "signature"])
+def test_minhash_deduplication_incremental_index(tmp_path, verify):
+    fixtures = FIXTURES_PATH / "documents_with_fuzzy_duplicates"
+    (tmp_path / "new_document.txt").write_text("an entirely new document with nothing in common with the licenses")
+    kwargs = dict(num_hashes=500, num_bands=50, ngrams=5, jaccard_threshold=0.8, verify=verify)
+    index_directory = tmp_path / "index"
+
+    first = minhash_deduplication(
+        [fixtures / "pytorch_license.txt", fixtures / "rails_mit_license.txt"],
+        output_directory=tmp_path / "first",
+        index_directory=index_directory,
+        **kwargs,
+    )
+    assert first.num_kept_documents == 2
+    # The near-duplicate of an already indexed document is dropped, the new document is kept.
+    second = minhash_deduplication(
+        [fixtures / "react_mit_license.txt", tmp_path / "new_document.txt"],
+        output_directory=tmp_path / "second",
+        index_directory=index_directory,
+        **kwargs,
+    )
+    assert second.num_duplicate_pairs == 1
+    assert [path.name for path in (tmp_path / "second").iterdir()] == ["new_document.txt"]
+    assert len(MinHashIndex(index_directory, 500, 50, 5)) == 4
+
+    with pytest.raises(ValueError):
+        MinHashIndex(index_directory, 500, 25, 5)
+
+
+def test_minhash_deduplication_incremental_index_without_original_files(tmp_path):
+    fixtures = FIXTURES_PATH / "documents_with_fuzzy_duplicates"
+    kwargs = dict(num_hashes=500, num_bands=50, ngrams=5, jaccard_threshold=0.8, verify="jaccard")
+    index_directory = tmp_path / "index"
+    indexed = tmp_path / "indexed"
+    indexed.mkdir()
+    for name in ("pytorch_license.txt", "rails_mit_license.txt"):
+        (indexed / name).write_text((fixtures / name).read_text())
+    minhash_deduplication(
+        sorted(indexed.iterdir()), output_directory=tmp_path / "first", index_directory=index_directory, **kwargs
+    )
+    index = MinHashIndex(index_directory, 500, 50, 5)
+    minhasher = MinHasher(num_hashes=500, ngrams=5)
+    expected = minhasher.ngram_hashes((indexed / "rails_mit_license.txt").read_text())
+    # Indexed documents are verified against their stored n-grams once the originals are gone.
+    shutil.rmtree(indexed)
+    assert (index.ngram_hashes_of(1) == expected).all()
+    second = minhash_deduplication(
+        [fixtures / "react_mit_license.txt"],
+        output_directory=tmp_path / "second",
+        index_directory=index_directory,
+        **kwargs,
+    )
+    assert second.num_duplicate_pairs == 1
+    assert second.num_kept_documents == 0
@@ -0,0 +1,33 @@
+import logging
+
+import fasttext
+import pytest
+
+from cs336_data import models
+
+logger = logging.getLogger(__name__)
+
+
+def test_get_model_loads_once_from_assets_dir(tmp_path, monkeypatch):
+    train_path = tmp_path / "train.txt"
+    with open(train_path, "w") as f:
+        for _ in range(20):
+            f.write("__label__wiki an encyclopedia article about history\n")
+            f.write("__label__cc click here to buy cheap products now\n")
+    fasttext.train_supervised(str(train_path), epoch=1, thread=1, verbose=0).save_model(str(tmp_path / "tiny.bin"))
+
+    monkeypatch.setenv(models.ASSETS_DIR_ENV_VAR, str(tmp_path))
+    monkeypatch.setitem(models.MODEL_FILES, "tiny", "tiny.bin")
+    monkeypatch.setattr(models, "_models", {})
+
+    assert models.model_path("tiny") == tmp_path / "tiny.bin"
+    models.preload_models("tiny")
+    model = models.get_model("tiny")
+    assert model is models.get_model("tiny")
+    assert set(model.labels) == {"__label__wiki", "__label__cc"}
+
+
+def test_model_path_missing(tmp_path, monkeypatch):
+    monkeypatch.setenv(models.ASSETS_DIR_ENV_VAR, str(tmp_path))
+    with pytest.raises(FileNotFoundError, match="get_assets.sh"):
+        models.model_path("language_identification")
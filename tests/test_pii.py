@@ -1,6 +1,6 @@
 import logging
 
-from .adapters import run_mask_emails, run_mask_ips, run_mask_phone_numbers
+from .adapters import run_mask_emails, run_mask_ips, run_mask_phone_numbers, run_mask_pii
 
 logger = logging.getLogger(__name__)
 
@@ -51,9 +51,47 @@ def test_mask_phones_single():
         assert num_masked == 1
 
 
+def test_mask_phones_multiple_spaces():
+    # Groups separated by runs of whitespace are phone numbers too, as they were when whitespace was normalized.
+    numbers = ["283  182  3829", "(283)  182-3829", "(283)\t182 3829", "+1  283 182\n3829"]
+    for number in numbers:
+        masked_text, num_masked = run_mask_phone_numbers(f"Call {number} today.")
+        assert masked_text == "Call |||PHONE_NUMBER||| today."
+        assert num_masked == 1
+
+
 def test_mask_ips():
     test_string = "You can access the server at 192.0.2.146."
     expected_masked_text = "You can access the server at |||IP_ADDRESS|||."
     masked_text, num_masked = run_mask_ips(test_string)
     assert masked_text == expected_masked_text
     assert num_masked == 1
+
+
+def test_mask_ips_rejects_octets_above_255():
+    # Unlike the original \d{1,3} pattern, every octet must be in 0-255.
+    test_string = "Servers 255.255.255.255, 0.0.0.0 and 10.1.2.3, but not 256.1.2.3 or 999.999.999.999."
+    masked_text, num_masked = run_mask_ips(test_string)
+    expected_masked_text = (
+        "Servers |||IP_ADDRESS|||, |||IP_ADDRESS||| and |||IP_ADDRESS|||, but not 256.1.2.3 or 999.999.999.999."
+    )
+    assert masked_text == expected_masked_text
+    assert num_masked == 3
+
+
+def test_mask_pii_all_kinds():
+    test_string = (
+        "Email pl@fakedomain.ai or call (283) 182 3829 / 283-182-3829, "
+        "the server is at 192.0.2.146."
+    )
+    expected_masked_text = (
+        "Email |||EMAIL_ADDRESS||| or call |||PHONE_NUMBER||| / |||PHONE_NUMBER|||, "
+        "the server is at |||IP_ADDRESS|||."
+    )
+    masked_text, counts = run_mask_pii(test_string)
+    assert masked_text == expected_masked_text
+    assert counts == {"email": 1, "ip": 1, "phone": 2}
+
+    masked_text, counts = run_mask_pii(test_string, kinds=("ip",))
+    assert masked_text == test_string.replace("192.0.2.146", "|||IP_ADDRESS|||")
+    assert counts == {"ip": 1}
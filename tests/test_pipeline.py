@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+
+import pytest
+from xopen import xopen
+
+from cs336_data.pipeline import (
+    Document,
+    GopherFilter,
+    LengthFilter,
+    Pipeline,
+    PIIMasker,
+    Stage,
+    run_pipeline,
+    run_pipeline_on_shards,
+    shard_output_paths,
+)
+
+from .common import FIXTURES_PATH, write_warc
+
+logger = logging.getLogger(__name__)
+
+
+class RejectUrls(Stage):
+    name = "urls"
+    batch_size = 2
+
+    def __init__(self, suffix):
+        self.suffix = suffix
+        self.seen = 0
+
+    def process_batch(self, documents):
+        self.seen += len(documents)
+        return [None if document.url.endswith(self.suffix) else document for document in documents]
+
+
+def test_pipeline_stops_at_first_rejection():
+    documents = [Document(str(i), f"http://example.com/{i}", text) for i, text in enumerate(["", "a", " ", "b", "c"])]
+    rejecting = RejectUrls("/3")
+    pipeline = Pipeline([LengthFilter(), rejecting, PIIMasker()])
+    kept = list(pipeline.run(documents))
+    assert [document.record_id for document in kept] == ["1", "4"]
+    assert rejecting.seen == 3
+    assert pipeline.stats.num_documents == 5
+    assert pipeline.stats.num_kept == 2
+    assert pipeline.stats.rejections == {"length": 2, "urls": 1, "pii": 0}
+
+
+def test_run_pipeline_on_warc(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    pages = [
+        ("http://example.com/moby", moby_bytes),
+        ("http://example.com/contact", b"<html><body><p>Mail me at someone@example.com</p></body></html>"),
+        ("http://example.com/empty", b"<html><body></body></html>"),
+    ]
+    write_warc(tmp_path / "shard.warc", pages)
+
+    stages = [LengthFilter(), GopherFilter(tokenizer="regex"), PIIMasker()]
+    stats = run_pipeline(
+        tmp_path / "shard.warc", tmp_path / "kept.jsonl.gz", stages, stats_path=tmp_path / "stats.json"
+    )
+    assert stats.num_documents == 3
+    assert stats.rejections == {"length": 1, "gopher": 1, "pii": 0}
+    assert json.loads((tmp_path / "stats.json").read_text())["num_kept"] == 1
+
+    with xopen(tmp_path / "kept.jsonl.gz") as f:
+        kept = [json.loads(line) for line in f]
+    assert [document["url"] for document in kept] == ["http://example.com/moby"]
+    assert kept[0]["pii"] == {"email": 0, "ip": 0, "phone": 0}
+
+
+def test_run_pipeline_on_shards_resumes(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    warc_files = []
+    for shard in range(3):
+        warc_files.append(tmp_path / f"shard{shard}.warc")
+        pages = [(f"http://example.com/{shard}/moby", moby_bytes), (f"http://example.com/{shard}/empty", b"")]
+        write_warc(warc_files[-1], pages)
+    stages = [LengthFilter(), GopherFilter(tokenizer="regex"), PIIMasker()]
+
+    summary = run_pipeline_on_shards(warc_files, tmp_path / "out", stages, num_workers=2, max_in_flight=2)
+    assert (summary.num_shards, summary.num_skipped_shards) == (3, 0)
+    assert (summary.num_documents, summary.num_kept) == (6, 3)
+    assert summary.rejection_rates == {"length": 0.5, "gopher": 0.0, "pii": 0.0}
+
+    # Only the shard without a completion marker is processed again.
+    output_path, done_path = shard_output_paths(warc_files[1], tmp_path / "out")
+    done_path.unlink()
+    output_path.unlink()
+    resumed = run_pipeline_on_shards(warc_files, tmp_path / "out", stages, num_workers=2)
+    assert (resumed.num_shards, resumed.num_skipped_shards) == (3, 2)
+    assert (resumed.num_documents, resumed.num_kept) == (6, 3)
+    assert output_path.exists()
+    assert json.loads((tmp_path / "out" / "summary.json").read_text())["num_kept"] == 3
+    # Throughput only counts the shard processed by this run, since `seconds` only measures this run.
+    assert resumed.num_processed_documents == 2
+    assert resumed.num_processed_bytes == os.path.getsize(warc_files[1])
+    assert resumed.documents_per_second == 2 / resumed.seconds
+    assert resumed.mb_per_second == os.path.getsize(warc_files[1]) / 1e6 / resumed.seconds
+
+    finished = run_pipeline_on_shards(warc_files, tmp_path / "out", stages, num_workers=2)
+    assert (finished.num_skipped_shards, finished.num_documents) == (3, 6)
+    assert finished.documents_per_second == finished.mb_per_second == 0.0
+
+
+def test_run_pipeline_on_shards_same_shard_names(tmp_path):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    # Like CommonCrawl segments, whose shards have the same names in different directories.
+    warc_files = []
+    for segment in range(2):
+        (tmp_path / f"segment{segment}").mkdir()
+        warc_files.append(tmp_path / f"segment{segment}" / "shard.warc")
+        write_warc(warc_files[-1], [(f"http://example.com/{segment}/moby", moby_bytes)])
+    stages = [LengthFilter()]
+
+    summary = run_pipeline_on_shards(warc_files, tmp_path / "out", stages, num_workers=2)
+    assert (summary.num_shards, summary.num_kept) == (2, 2)
+    for segment, warc_file in enumerate(warc_files):
+        output_path, done_path = shard_output_paths(warc_file, tmp_path / "out")
+        assert done_path.exists()
+        with xopen(output_path) as f:
+            assert [json.loads(line)["url"] for line in f] == [f"http://example.com/{segment}/moby"]
+
+    resumed = run_pipeline_on_shards(warc_files, tmp_path / "out", stages, num_workers=2)
+    assert resumed.num_skipped_shards == 2
+    # The same shard listed twice, here through a symlink, would write one output twice.
+    (tmp_path / "link.warc").symlink_to(warc_files[0])
+    with pytest.raises(ValueError, match="same shard"):
+        run_pipeline_on_shards([*warc_files, tmp_path / "link.warc"], tmp_path / "out", stages)
@@ -1,7 +1,18 @@
 import logging
 
+from cs336_data import gopher_filters, models
+from cs336_data.gopher_filters import (
+    GopherThresholds,
+    count_alpha_words,
+    gopher_quality_filter,
+    gopher_statistics,
+    tokenize,
+)
+from cs336_data.pipeline import GopherFilter, LengthFilter
+from cs336_data.quality_classifier import classify_quality_batch, train_quality_classifier, write_training_file
+
 from .adapters import run_classify_quality, run_gopher_quality_filter
-from .common import FIXTURES_PATH
+from .common import FIXTURES_PATH, write_warc
 
 logger = logging.getLogger(__name__)
 
@@ -92,3 +103,90 @@ def test_gopher_less_than_80_percent_words_with_alphabetic_character():
     words += ["word" for _ in range(2)]
     text = "the and " + " ".join(words)
     assert not run_gopher_quality_filter(text)
+
+
+def test_gopher_regex_tokenizer():
+    lines = ["The line here is an example of line ending with an ellipsis..." for _ in range(70)]
+    lines += ["This is a normal line." for _ in range(30)]
+    rejected = [
+        "The string you are reading is a short snippet of text.",
+        "The string you are reading is too long of a text. " * 50000,
+        "the be " * 100,
+        "the and " + "extraordinarily extraordinarily extraordinarily longesest " * 100,
+        "\n".join(lines),
+        "the and " + " ".join(["123" for _ in range(8)] + ["word" for _ in range(2)]),
+    ]
+    accepted = [
+        "The string you are reading is a long snippet of text." * 100,
+        "The string you are reading is an okay example of text. " * 5000,
+        "the with " * 100,
+        "the and this is fine " * 100,
+    ]
+    for text in rejected:
+        assert not gopher_quality_filter(text, tokenizer="regex")
+    for text in accepted:
+        assert gopher_quality_filter(text, tokenizer="regex")
+
+
+def test_gopher_count_alpha_words_matches_isalpha():
+    words = ["word", "123", "_", "a_1", "x²", "²", "½", "Ⅻ", "٣", "日本", "é", "e\u0301", "\u0301", "...", "²a", "--"]
+    assert count_alpha_words(words) == sum(any(c.isalpha() for c in word) for word in words)
+    ascii_words = ["word", "123", "_", "a_1", "...", "x9"]
+    assert count_alpha_words(ascii_words) == sum(any(c.isalpha() for c in word) for word in ascii_words)
+
+
+def test_gopher_nltk_tokenizer_normalizes_text(monkeypatch):
+    # The NLTK path sees lowercased text with collapsed whitespace, like the original filter.
+    monkeypatch.setattr(gopher_filters, "word_tokenize", lambda text: [text])
+    assert tokenize("The  Quick\n\tBrown\r\nFox", "nltk") == ["the quick brown fox"]
+
+
+def test_gopher_statistics_rethreshold():
+    text = "\n".join(["The line here is an example of line ending with an ellipsis..."] * 3 + ["123 456 789"] * 7)
+    stats = gopher_statistics(text, tokenizer="regex")
+    # 12 words plus "..." per ellipsis line, 3 numbers per other line
+    assert stats.num_words == 3 * 13 + 7 * 3
+    assert stats.ellipsis_line_ratio == 0.3
+    assert stats.num_alpha_words == 3 * 12
+    assert abs(stats.mean_word_length - (3 * 51 + 7 * 9) / 60) < 1e-9
+    assert abs(stats.alpha_word_ratio - 36 / 60) < 1e-9
+
+    assert GopherThresholds().failed_rule(stats) == "num_alpha_words"
+    relaxed = GopherThresholds(min_words=10, min_alpha_words=10, min_alpha_word_ratio=0.5)
+    assert relaxed.passes(stats)
+    assert gopher_quality_filter(text, tokenizer="regex", thresholds=relaxed)
+    assert not relaxed.passes(stats._replace(ellipsis_line_ratio=0.5))
+
+
+def test_quality_classifier_training_pipeline(tmp_path, monkeypatch):
+    with open(FIXTURES_PATH / "moby.html", "rb") as f:
+        moby_bytes = f.read()
+    with open(FIXTURES_PATH / "low_quality_cc.txt", "rb") as f:
+        low_quality_bytes = b"<html><body><p>" + f.read() + b"</p></body></html>"
+    write_warc(tmp_path / "positives.warc", [(f"http://example.com/moby/{i}", moby_bytes) for i in range(30)])
+    write_warc(tmp_path / "negatives.warc", [(f"http://example.com/cc/{i}", low_quality_bytes) for i in range(40)])
+
+    stats = write_training_file(
+        tmp_path / "train.txt",
+        [tmp_path / "positives.warc"],
+        [tmp_path / "negatives.warc"],
+        positive_stages=[LengthFilter(), GopherFilter(tokenizer="regex")],
+        max_examples_per_class=25,
+    )
+    assert (stats.num_positives, stats.num_negatives) == (25, 25)
+    lines = (tmp_path / "train.txt").read_text().splitlines()
+    assert [line.split(" ", 1)[0] for line in lines[:4]] == ["__label__wiki", "__label__cc"] * 2
+
+    monkeypatch.setenv(models.ASSETS_DIR_ENV_VAR, str(tmp_path / "assets"))
+    monkeypatch.setattr(models, "_models", {})
+    train_quality_classifier(tmp_path / "train.txt", epoch=10, lr=1.0, thread=1, seed=0)
+    assert (tmp_path / "assets" / models.MODEL_FILES["quality"]).exists()
+
+    with open(FIXTURES_PATH / "moby_extracted.txt") as f:
+        moby_text = f.read()
+    with open(FIXTURES_PATH / "low_quality_cc.txt") as f:
+        low_quality_text = f.read()
+    labels, scores = classify_quality_batch([moby_text, low_quality_text])
+    assert labels.tolist() == ["wiki", "cc"]
+    assert (scores > 0.5).all()
+    assert run_classify_quality(moby_text)[0] == "wiki"
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from cs336_data.segments import atomic_open, list_segments, next_segment_prefix, write_segment
+
+
+def test_write_segment(tmp_path):
+    prefix = next_segment_prefix(tmp_path, [])
+    write_segment(prefix, np.arange(3, dtype=np.uint64), {"counts": np.ones(3, dtype=np.uint8)})
+    assert list_segments(tmp_path) == [prefix]
+    assert np.load(f"{prefix}.counts.npy").tolist() == [1, 1, 1]
+
+    # A run interrupted while writing its keys leaves no segment behind.
+    prefix = next_segment_prefix(tmp_path, list_segments(tmp_path))
+    with pytest.raises(KeyboardInterrupt), atomic_open(f"{prefix}.keys.npy") as f:
+        f.write(b"half a file")
+        raise KeyboardInterrupt
+    assert list_segments(tmp_path) == [str(tmp_path / "segment000000")]
+
+    # Numbers keep increasing after earlier segments were removed, e.g. by compaction.
+    assert next_segment_prefix(tmp_path, [str(tmp_path / "segment000004")]) == str(tmp_path / "segment000005")
@@ -0,0 +1,70 @@
+import gzip
+import json
+import math
+
+import numpy as np
+
+from cs336_basics.data import IndexedTokens
+from cs336_data.tokenization import get_tokenizer, tokenize_to_bin
+
+from .common import FIXTURES_PATH
+
+
+def save_tiny_tokenizer(directory):
+    # A small byte-level BPE stands in for GPT-2, which would have to be downloaded.
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=300, special_tokens=["<|endoftext|>"], initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    )
+    tokenizer.train_from_iterator([(FIXTURES_PATH / "moby_extracted.txt").read_text()], trainer)
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<|endoftext|>").save_pretrained(directory)
+    return str(directory)
+
+
+def test_tokenize_to_bin(tmp_path):
+    tokenizer_name = save_tiny_tokenizer(tmp_path / "tokenizer")
+    text = (FIXTURES_PATH / "high_quality_wiki_reference.txt").read_text()
+    texts = [line for line in text.splitlines() if line.strip()]
+    # Uneven files, one of them empty, to check that chunks are concatenated in input order.
+    input_files = []
+    for i, (start, end) in enumerate([(0, 3), (3, 3), (3, 20), (20, len(texts))]):
+        path = tmp_path / f"shard{i}.jsonl.gz"
+        with gzip.open(path, "wt") as f:
+            for j, text in enumerate(texts[start:end], start):
+                f.write(json.dumps({"text": text, "url": None, "score": j if j % 2 else None}) + "\n")
+        input_files.append(path)
+
+    output_path = tmp_path / "train.bin"
+    stats = tokenize_to_bin(
+        input_files, output_path, tokenizer_name, num_workers=2, batch_size=4, metadata_fields=["score"]
+    )
+
+    tokenizer = get_tokenizer(tokenizer_name)
+    expected = [token for text in texts for token in tokenizer.encode(text) + [tokenizer.eos_token_id]]
+    tokens = np.memmap(output_path, dtype=np.uint16, mode="r")
+    assert tokens.tolist() == expected
+    assert stats.num_documents == len(texts)
+    assert stats.num_tokens == len(expected)
+
+    dataset = IndexedTokens(output_path)
+    assert len(dataset) == len(texts)
+    for i, text in enumerate(texts):
+        assert dataset.document(i).tolist() == tokenizer.encode(text) + [tokenizer.eos_token_id]
+    assert dataset.metadata["shard"].tolist() == [0] * 3 + [2] * 17 + [3] * (len(texts) - 20)
+    scores = dataset.metadata["score"].tolist()
+    assert all(math.isnan(score) if i % 2 == 0 else score == i for i, score in enumerate(scores))
+
+    # Only odd documents have a score, so weighting by it never samples even ones.
+    dataset.set_weights(np.nan_to_num(dataset.metadata["score"]))
+    documents = dataset.sample_documents(1000)
+    assert (documents % 2 == 1).all()
+    x, y = dataset.get_batch(8, 4, "cpu")
+    starts = set(dataset.offsets[1::2].tolist())
+    for row_x, row_y in zip(x.tolist(), y.tolist()):
+        assert row_x[1:] == row_y[:-1]
+        assert any(dataset.tokens[start : start + 4].tolist() == row_x for start in starts)
@@ -1,6 +1,13 @@
 import logging
 
-from .adapters import run_classify_nsfw, run_classify_toxic_speech
+import fasttext
+import numpy as np
+import pytest
+
+from cs336_data import models
+from cs336_data.pipeline import Document, HarmfulContentFilter, Pipeline
+
+from .adapters import run_classify_harmful_batch, run_classify_nsfw, run_classify_toxic_speech
 
 logger = logging.getLogger(__name__)
 
@@ -55,3 +62,36 @@ def test_classify_toxic_speech():
     assert prediction == "non-toxic"
     assert isinstance(score, float)
     assert score > 0
+
+
+@pytest.fixture
+def tiny_harmful_models(tmp_path, monkeypatch):
+    """Stand-ins for the Jigsaw classifiers, trained on a handful of lines."""
+    monkeypatch.setenv(models.ASSETS_DIR_ENV_VAR, str(tmp_path))
+    monkeypatch.setattr(models, "_models", {})
+    for name, harmful, harmless in (("hatespeech", "toxic", "non-toxic"), ("nsfw", "nsfw", "non-nsfw")):
+        train_path = tmp_path / f"{name}.txt"
+        with open(train_path, "w") as f:
+            for _ in range(50):
+                f.write(f"__label__{harmful} you idiot moron shut up\n")
+                f.write(f"__label__{harmless} thanks for the helpful article edit\n")
+        model = fasttext.train_supervised(str(train_path), epoch=25, lr=1.0, thread=1, verbose=0, seed=0)
+        model.save_model(str(tmp_path / f"{name}.bin"))
+        monkeypatch.setitem(models.MODEL_FILES, name, f"{name}.bin")
+
+
+def test_classify_harmful_batch(tiny_harmful_models):
+    texts = ["you idiot\nmoron", "thanks for the helpful\narticle", "shut up idiot"]
+    labels, scores = run_classify_harmful_batch(texts)
+    assert labels.shape == scores.shape == (3, 2)
+    assert scores.dtype == np.float32
+    assert labels.tolist() == [["toxic", "nsfw"], ["non-toxic", "non-nsfw"], ["toxic", "nsfw"]]
+    for text, (hatespeech, nsfw), (hatespeech_score, _) in zip(texts, labels.tolist(), scores.tolist()):
+        assert run_classify_toxic_speech(text) == (hatespeech, pytest.approx(hatespeech_score))
+        assert run_classify_nsfw(text)[0] == nsfw
+
+    documents = [Document(str(i), "", text) for i, text in enumerate(texts)]
+    pipeline = Pipeline([HarmfulContentFilter()])
+    kept = list(pipeline.run(documents))
+    assert [document.metadata for document in kept] == [{"hatespeech": "non-toxic", "nsfw": "non-nsfw"}]
+    assert pipeline.stats.rejections == {"harmful": 2}